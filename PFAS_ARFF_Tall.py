@@ -10,7 +10,9 @@
 
 # Add to this script if/when you do find things that need to be added so that the script can be made more robust.
 
-# Last updated 10/11/2023
+# Last updated 10/18/2026
+
+import sys
 
 import pandas as pd # Used for working with Excel
 
@@ -25,6 +27,10 @@ name = "Grayling-GAAF_SiteSummary_Copy"
 # Geodatabase name (this script assumes your gdb and site summary workbook are in the same folder)
 gdb = "PFAS.gdb"
 
+# Folder with these scripts (for PFAS_Units)
+scripts = r"C:\Users\JohnsonN35\Local_Work\PFAS_Script"
+sys.path.append(scripts)
+
 # Name of the site; used later on to definition query the address layer
 site = "'Grayling GAAF'" # Make sure the site listed here is the same one you used when attributing the address layer's "site" field
 site_ = "Grayling_GAAF"
@@ -46,7 +52,15 @@ sheet = "AllResultsFlatFile"
 headerRow = 0 # Specific row (0-indexed) that contains the headers; accounts for the rows you skip
 skipRows = 3 # Number of rows to skip
 
-ff = pd.read_excel(location + "/" + name + ext, sheet_name = sheet, header = headerRow, skiprows = skipRows)
+raw = pd.read_excel(location + "/" + name + ext, sheet_name = sheet, header = headerRow, skiprows = skipRows)
+
+# Convert the PFAS rows' Result_Num, RDL and LOQ to ng/l (water) or ng/g (solids); the standard unit goes in Result_Unit_Stdz.
+# This works from the frame as read (raw), so re-running it never converts twice. Units that aren't in the registry in PFAS_Units stop the
+# script with a report of which units and samples; add them to unitRegistry if they're legitimate. Other analyte groups (gen chem) are left as is.
+from PFAS_Units import convert_units
+
+pfas = raw["Analyte_Group"] == "PFAS"
+ff = pd.concat([convert_units(raw[pfas]), raw[~pfas].assign(Result_Unit_Stdz = raw.loc[~pfas, "Result_Unit"])]).sort_index()
 
 outName = name.replace("-","_") + "_AllResultsFlatFile" # Having a hyphen in the site name will be a problem later, so replace it
 ff.to_excel(location + "/" + outName + ext, sheet_name = "AllResultsFlatFile")
@@ -122,6 +136,7 @@ Analyte_Abbrev "Analyte_Abbrev" true true false 255 Text 0 0,First,#,inputs,Anal
 Result "Result" true true false 255 Text 0 0,First,#,inputs,Result,0,255;\
 Result_Num "Result_Num" true true false 8 Double 0 0,First,#,inputs,Result_Num,-1,-1;\
 Result_Unit "Result_Unit" true true false 255 Text 0 0,First,#,inputs,Result_Unit,0,255;\
+Result_Unit_Stdz "Result_Unit_Stdz" true true false 255 Text 0 0,First,#,inputs,Result_Unit_Stdz,0,255;\
 Result_Qualifier "Result_Qualifier" true true false 255 Text 0 0,First,#,inputs,Result_Qualifier,0,255;\
 Detect_Flag "Detect_Flag" true true false 255 Text 0 0,First,#,inputs,Detect_Flag,0,255;\
 RDL "RDL" true true false 8 Double 0 0,First,#,inputs,RDL,-1,-1;\
@@ -260,12 +275,7 @@ arcpy.management.CalculateField(samplesFC, "Analysis_Method_Stdz", '"E537.1"')
 # Clear selection
 arcpy.management.SelectLayerByAttribute(samplesFC, "CLEAR_SELECTION", "CLEAR_SELECTION")
 
-# Bring the messy Result_Unit values into the standardized value field
-arcpy.management.CalculateField(samplesFC, "Result_Unit_Stdz", "!Result_Unit!")
-
-# ng/l
-arcpy.management.SelectLayerByAttribute(samplesFC, "NEW_SELECTION", "Result_Unit = 'ng/L'")
-arcpy.management.CalculateField(samplesFC, "Result_Unit_Stdz", '"ng/l"')
+# Result_Unit_Stdz (and the converted Result_Num, RDL and LOQ) were filled in by convert_units when the workbook was read, above
 
 # -------------------MATRIX-------------------
 
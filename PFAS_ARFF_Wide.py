@@ -8,7 +8,9 @@
 
 # Add to this script if/when you do find things that need to be added so that the script can be made more robust.
 
-# Last updated 10/11/2023
+# Last updated 10/18/2026
+
+import sys
 
 import pandas as pd # Used for re-shaping the table
 import openpyxl # Used for working with Excel
@@ -33,6 +35,10 @@ ext = ".xlsx"
 # Geodatabase name (this script assumes your gdb is in the same place as where you want to save any Excel files)
 gdb = "PFAS.gdb"
 
+# Folder with these scripts (for PFAS_Standards and its PFAS_Standards.csv)
+scripts = r"C:\Users\JohnsonN35\Local_Work\PFAS_Script"
+sys.path.append(scripts)
+
 # Create a pandas dataframe
 
 fields = ['Site','AddressID','Site_Name','Site_Subarea','Data_File_Name','Report_File_Name','Lab_Name','Lab_Work_Order','Lab_Sample_ID','Field_Sample_ID','Field_Location_Code','Duplicate','Sampled_Address_Clean','Sampling_Round','Sample_PrePost','Collect_Date','Collected_By','Matrix_Stdz','Analysis_Method_Stdz','Sample_NDE','Sample_TotalPFAS','Analyte_Abbrev','Result_Num','Result_Qualifier']
@@ -53,7 +59,7 @@ df_wide.reset_index(inplace = True)
 
 df_wide.head()
 
-# Why not include Analyte_NDE from the tall file? Only 7 analytes (as of October 2023) have these values, so it would be a lot of empty fields to deal with
+# Why not include Analyte_NDE from the tall file? Only the analytes in PFAS_Standards.csv (7 as of October 2023) have these values, so it would be a lot of empty fields to deal with
 # for not much gain. We'll create fields for these analytes' NDE status and re-calculate these values in a later step.
 
 # Export to an Excel spreadsheet
@@ -463,74 +469,32 @@ TotalPFAS_Result_Qualifier "Total PFAS Result Qualifier" true true false 20 Text
 
 arcpy.management.Append(inputTable, targetTable, "NO_TEST", field_mapping)
 
-# Calculate NDEs
+# Calculate NDEs against the standards (e.g. MCLs) in force on each sample's Collect_Date; the limits are in PFAS_Standards.csv
 
-arcpy.management.SelectLayerByAttribute(targetTable, "CLEAR_SELECTION", "CLEAR_SELECTION")
+from PFAS_Standards import analyte_field_name, load_standards, wide_nde
 
-# HFPO-DA (GenX)
-arcpy.management.SelectLayerByAttribute(targetTable, "NEW_SELECTION", "HFPO_DA_GenX_Result_Num = 0")
-arcpy.management.CalculateField(targetTable, "HFPO_DA_GenX_NDE", '"ND"')
-arcpy.management.SelectLayerByAttribute(targetTable, "NEW_SELECTION", "HFPO_DA_GenX_Result_Num > 0 And HFPO_DA_GenX_Result_Num <= 370")
-arcpy.management.CalculateField(targetTable, "HFPO_DA_GenX_NDE", '"D"')
-arcpy.management.SelectLayerByAttribute(targetTable, "NEW_SELECTION", "HFPO_DA_GenX_Result_Num > 370")
-arcpy.management.CalculateField(targetTable, "HFPO_DA_GenX_NDE", '"E"')
-
-
-# PFBS
-arcpy.management.SelectLayerByAttribute(targetTable, "NEW_SELECTION", "PFBS_Result_Num = 0")
-arcpy.management.CalculateField(targetTable, "PFBS_NDE", '"ND"')
-arcpy.management.SelectLayerByAttribute(targetTable, "NEW_SELECTION", "PFBS_Result_Num > 0 And PFBS_Result_Num <= 420")
-arcpy.management.CalculateField(targetTable, "PFBS_NDE", '"D"')
-arcpy.management.SelectLayerByAttribute(targetTable, "NEW_SELECTION", "PFBS_Result_Num > 420")
-arcpy.management.CalculateField(targetTable, "PFBS_NDE", '"E"')
-
-
-# PFHxA
-arcpy.management.SelectLayerByAttribute(targetTable, "NEW_SELECTION", "PFHxA_Result_Num = 0")
-arcpy.management.CalculateField(targetTable, "PFHxA_NDE", '"ND"')
-arcpy.management.SelectLayerByAttribute(targetTable, "NEW_SELECTION", "PFHxA_Result_Num > 0 And PFHxA_Result_Num <= 400000")
-arcpy.management.CalculateField(targetTable, "PFHxA_NDE", '"D"')
-arcpy.management.SelectLayerByAttribute(targetTable, "NEW_SELECTION", "PFHxA_Result_Num > 400000")
-arcpy.management.CalculateField(targetTable, "PFHxA_NDE", '"E"')
-
-
-# PFHxS
-arcpy.management.SelectLayerByAttribute(targetTable, "NEW_SELECTION", "PFHxS_Result_Num = 0")
-arcpy.management.CalculateField(targetTable, "PFHxS_NDE", '"ND"')
-arcpy.management.SelectLayerByAttribute(targetTable, "NEW_SELECTION", "PFHxS_Result_Num > 0 And PFHxS_Result_Num <= 51")
-arcpy.management.CalculateField(targetTable, "PFHxS_NDE", '"D"')
-arcpy.management.SelectLayerByAttribute(targetTable, "NEW_SELECTION", "PFHxS_Result_Num > 51")
-arcpy.management.CalculateField(targetTable, "PFHxS_NDE", '"E"')
-
-
-# PFOA
-arcpy.management.SelectLayerByAttribute(targetTable, "NEW_SELECTION", "PFOA_Result_Num = 0")
-arcpy.management.CalculateField(targetTable, "PFOA_NDE", '"ND"')
-arcpy.management.SelectLayerByAttribute(targetTable, "NEW_SELECTION", "PFOA_Result_Num > 0 And PFOA_Result_Num <= 8")
-arcpy.management.CalculateField(targetTable, "PFOA_NDE", '"D"')
-arcpy.management.SelectLayerByAttribute(targetTable, "NEW_SELECTION", "PFOA_Result_Num > 8")
-arcpy.management.CalculateField(targetTable, "PFOA_NDE", '"E"')
-
-
-# PFOS
-arcpy.management.SelectLayerByAttribute(targetTable, "NEW_SELECTION", "PFOS_Result_Num = 0")
-arcpy.management.CalculateField(targetTable, "PFOS_NDE", '"ND"')
-arcpy.management.SelectLayerByAttribute(targetTable, "NEW_SELECTION", "PFOS_Result_Num > 0 And PFOS_Result_Num <= 8")
-arcpy.management.CalculateField(targetTable, "PFOS_NDE", '"D"')
-arcpy.management.SelectLayerByAttribute(targetTable, "NEW_SELECTION", "PFOS_Result_Num > 8")
-arcpy.management.CalculateField(targetTable, "PFOS_NDE", '"E"')
-
-
-# PFNA
-arcpy.management.SelectLayerByAttribute(targetTable, "NEW_SELECTION", "PFNA_Result_Num = 0")
-arcpy.management.CalculateField(targetTable, "PFNA_NDE", '"ND"')
-arcpy.management.SelectLayerByAttribute(targetTable, "NEW_SELECTION", "PFNA_Result_Num > 0 And PFNA_Result_Num <= 6")
-arcpy.management.CalculateField(targetTable, "PFNA_NDE", '"D"')
-arcpy.management.SelectLayerByAttribute(targetTable, "NEW_SELECTION", "PFNA_Result_Num > 6")
-arcpy.management.CalculateField(targetTable, "PFNA_NDE", '"E"')
+standards = load_standards(scripts + "/PFAS_Standards.csv")
+
+# Only analytes with both a result field and an NDE field in the feature class can be calculated; add an <analyte>_NDE field (TEXT, length 2)
+# for a new analyte in the standards table to get its NDEs
+targetFields = set(field.name for field in arcpy.ListFields(targetTable))
+ndeAnalytes = [a for a in standards["Analyte_Abbrev"].unique() if analyte_field_name(a) + "_Result_Num" in targetFields and analyte_field_name(a) + "_NDE" in targetFields]
+skipped = [a for a in standards["Analyte_Abbrev"].unique() if a not in ndeAnalytes]
+if skipped:
+    print("No result and NDE fields for these analytes in the standards table, so no NDEs for them: ", skipped)
+standards = standards[standards["Analyte_Abbrev"].isin(ndeAnalytes)]
+resultFields = [analyte_field_name(a) + "_Result_Num" for a in ndeAnalytes]
 
 arcpy.management.SelectLayerByAttribute(targetTable, "CLEAR_SELECTION", "CLEAR_SELECTION")
 
+ndeRows = pd.DataFrame.from_records(data = arcpy.da.SearchCursor(targetTable, ["OID@", "Collect_Date"] + resultFields), columns = ["OID", "Collect_Date"] + resultFields)
+ndes = wide_nde(ndeRows, standards)
+ndes.index = ndeRows["OID"]
+
+with arcpy.da.UpdateCursor(targetTable, ["OID@"] + list(ndes.columns)) as cursor:
+    for row in cursor:
+        cursor.updateRow([row[0]] + list(ndes.loc[row[0]]))
+
 # XY Join
 
 arcpy.management.JoinField(targetTable, "AddressID", addresses, "AddressID", "displayx;displayy")
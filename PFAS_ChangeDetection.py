@@ -0,0 +1,99 @@
+# This script is used for finding how each address's results changed from one sample to the next, for every analyte at once.
+
+# The Arcade expression (see "Arcade_FindHighestResult_CompareYears") compares one year's maximum with the all-time maximum for one analyte,
+# one feature at a time. This script sorts the "tall" data once by AddressID, analyte and Collect_Date and uses grouped shifts to get, for
+# every result, the previous result at the same address for the same analyte, the change and percent change, and the NDE transition
+# (e.g. ND -> D, D -> E). From that it builds a "new exceedances since last round" table for the whole site in one pass.
+
+# NDE status is worked out from Result_Num and the standard in force on each sample's Collect_Date (see PFAS_Standards): 0 = ND,
+# up to the limit = D, over = E, and NS for a detection with no standard in force (so analytes without a standard only get ND/NS).
+
+# Last updated 10/18/2026
+
+import numpy as np
+import pandas as pd # Used for the change detection
+
+from PFAS_Standards import load_standards, tall_nde
+
+# Things to definitely change per site and user
+
+# Geodatabase location and name, and the tall feature class to look at
+location = r"C:\Users\JohnsonN35\Local_Work\PFAS_Script"
+gdb = "PFAS.gdb"
+samplesFC = "Grayling_GAAF_SiteSummary_Copy_AllResultsFlatFile_XYEvent_FC"
+
+# Name of the site (used for files)
+site_ = "Grayling_GAAF"
+
+ext = ".xlsx"
+
+keyFields = ["AddressID", "Analyte_Abbrev"]
+
+
+def detect_changes(df, standards):
+    # One row per result with the previous result at the same address for the same analyte. Adds:
+    #   Prev_Collect_Date, Prev_Sampling_Round, Prev_Result_Num, Prev_NDE, NDE
+    #   Delta (Result_Num - Prev_Result_Num), Pct_Change (NaN when the previous result was 0 or there wasn't one)
+    #   NDE_Change (e.g. "ND->D", "D->E"; None for the first result or when the status didn't change)
+    #   New_Exceedance (E now, and the previous result wasn't E)
+    # Duplicate samples on the same day are collapsed to the highest result first, so a duplicate isn't counted as a "change".
+    df = df.dropna(subset = keyFields + ["Collect_Date"])
+    df = df.sort_values(keyFields + ["Collect_Date", "Result_Num"], na_position = "first", kind = "mergesort")
+    df = df.drop_duplicates(keyFields + ["Collect_Date"], keep = "last").reset_index(drop = True)
+
+    df["NDE"] = tall_nde(df, standards)
+
+    # Rows are sorted, so each row's previous sample is simply the row above it in the same group
+    groups = df.groupby(keyFields, sort = False)
+    for field in ["Collect_Date", "Sampling_Round", "Result_Num", "NDE"]:
+        df["Prev_" + field] = groups[field].shift(1)
+
+    df["Delta"] = df["Result_Num"] - df["Prev_Result_Num"]
+    prev = df["Prev_Result_Num"].where(df["Prev_Result_Num"] != 0)
+    df["Pct_Change"] = df["Delta"] / prev * 100
+
+    changed = df["Prev_NDE"].notna() & df["NDE"].notna() & (df["Prev_NDE"] != df["NDE"])
+    df["NDE_Change"] = np.where(changed, df["Prev_NDE"].astype(str) + "->" + df["NDE"].astype(str), None)
+    df["New_Exceedance"] = (df["NDE"] == "E") & (df["Prev_NDE"] != "E")
+
+    return df
+
+
+def new_exceedances(changes, latestRound = None):
+    # Compact table of results that are E now but weren't last time (or had no earlier sample), for the latest round by default
+    if latestRound is None:
+        latestRound = changes.loc[changes["Collect_Date"].idxmax(), "Sampling_Round"] if len(changes) else None
+    rows = changes[changes["New_Exceedance"] & (changes["Sampling_Round"] == latestRound)]
+    columns = ["AddressID", "Sampled_Address_Clean", "Analyte_Abbrev", "Sampling_Round", "Collect_Date", "Result_Num", "NDE",
+        "Prev_Sampling_Round", "Prev_Collect_Date", "Prev_Result_Num", "Prev_NDE", "Delta", "Pct_Change"]
+    return rows[[c for c in columns if c in rows.columns]].sort_values(["AddressID", "Analyte_Abbrev"]).reset_index(drop = True)
+
+
+def change_summary(changes):
+    # How many address/analyte results went up, went down, stayed the same, or changed NDE status, per sampling round
+    compared = changes[changes["Prev_Result_Num"].notna()]
+    direction = pd.Series(np.select([compared["Delta"] > 0, compared["Delta"] < 0], ["Up", "Down"], default = "Same"), index = compared.index, name = "Direction")
+    summary = pd.crosstab(compared["Sampling_Round"], direction)
+    summary["New_Exceedances"] = compared.groupby("Sampling_Round")["New_Exceedance"].sum()
+    return summary
+
+
+# Run change detection on the site (only when this is run as a script, so the functions above can be imported by other scripts)
+
+if __name__ == "__main__":
+    import arcpy # Only available in ArcGIS Pro's Python environment
+
+    fields = ["AddressID", "Sampled_Address_Clean", "Sampling_Round", "Collect_Date", "Analyte_Abbrev", "Result_Num"]
+    df = pd.DataFrame.from_records(data = arcpy.da.SearchCursor(location + "/" + gdb + "/" + samplesFC, fields), columns = fields)
+
+    changes = detect_changes(df, load_standards())
+    newE = new_exceedances(changes)
+
+    print(change_summary(changes))
+    print(len(newE), "new exceedances in the latest round")
+
+    outpath = location + "/" + site_ + "_Changes" + ext
+    with pd.ExcelWriter(outpath) as writer:
+        newE.to_excel(writer, sheet_name = "NewExceedances", index = False)
+        changes.to_excel(writer, sheet_name = "AllChanges", index = False)
+    print("Wrote", outpath)
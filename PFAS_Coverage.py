@@ -0,0 +1,173 @@
+# This script is used for seeing which addresses were sampled in which round, and which addresses are due (or overdue) for sampling.
+
+# One pass over the "tall" data builds a coverage structure for the site: a row of bits per AddressID with one bit per period (each
+# Sampling_Round by default, or calendar periods such as quarters), set when the address was sampled in that period, plus a second set of bits
+# for periods where the address had an exceedance (E). The bits are packed 8 periods to a byte (np.packbits), so a site with thousands of addresses
+# and dozens of rounds is a few kilobytes, and each of these is a handful of bitwise operations:
+#   missed_recent      addresses with no sample in any of the last N periods
+#   overdue_followups  addresses whose latest E hasn't been followed by another sample within X days
+#   never_sampled      addresses in the site's PFAS_Addresses set that have never been sampled
+
+# Rounds are put in order by their first Collect_Date, so round names don't have to sort properly. Calendar periods cover every period from the
+# first sample up to today, sampled or not. E status comes from PFAS_Standards.
+
+# Last updated 10/18/2026
+
+import numpy as np
+import pandas as pd # Used for building the coverage
+
+from PFAS_Standards import load_standards, tall_nde
+
+# Things to definitely change per site and user
+
+# Geodatabase location and name, and the tall feature class to look at
+location = r"C:\Users\JohnsonN35\Local_Work\PFAS_Script"
+gdb = "PFAS.gdb"
+samplesFC = "Grayling_GAAF_SiteSummary_Copy_AllResultsFlatFile_XYEvent_FC"
+
+# Master PFAS address layer and the site's name in its "Site" field
+addressesFC = "PFAS_Addresses"
+site = "Grayling GAAF"
+
+# Name of the site (used for files)
+site_ = "Grayling_GAAF"
+
+ext = ".xlsx"
+
+# What a coverage period is: "round" for Sampling_Round, or a pandas period frequency for Collect_Date (e.g. "Q" for quarters, "Y" for years)
+period = "round"
+
+# Addresses not sampled in any of the last missedPeriods periods are reported
+missedPeriods = 2
+
+# Addresses with an E are expected to be resampled within followupDays days
+followupDays = 90
+
+
+def period_labels(df, period = period, asOf = None):
+    # The period of each row, and the periods in order. Calendar periods run from the first sample's period through asOf's (today by default),
+    # including periods nobody was sampled in, so "the last N periods" means the last N calendar periods.
+    if period == "round":
+        firstDates = df.groupby("Sampling_Round")["Collect_Date"].min().sort_values(kind = "mergesort")
+        return df["Sampling_Round"], firstDates.index.to_numpy(dtype = object)
+    labels = pd.to_datetime(df["Collect_Date"]).dt.to_period(period)
+    if labels.isna().all():
+        return labels, np.array([], dtype = object)
+    last = max(labels.max(), pd.Timestamp.now().to_period(period) if asOf is None else pd.Timestamp(asOf).to_period(period))
+    return labels, pd.period_range(labels.min(), last, freq = period).to_numpy(dtype = object)
+
+
+def build_coverage(df, standards, period = period, asOf = None):
+    # Coverage of a tall frame (AddressID, Sampling_Round, Collect_Date, Analyte_Abbrev, Result_Num), with calendar periods up to asOf (today by
+    # default). Returns a dictionary of:
+    #   addresses        AddressIDs, one per row of the bit matrices
+    #   periods          period labels, one per bit, oldest first
+    #   sampled          packed bits (addresses x periods): sampled in that period
+    #   exceeded         packed bits (addresses x periods): an E in that period
+    #   lastSample       latest Collect_Date per address
+    #   lastExceedance   latest Collect_Date with an E per address (NaT if never)
+    df = df.dropna(subset = ["AddressID", "Collect_Date"])
+    df = df.assign(Collect_Date = pd.to_datetime(df["Collect_Date"]))
+    labels, periods = period_labels(df, period, asOf)
+
+    addressCodes, addresses = pd.factorize(df["AddressID"], sort = True)
+    periodCodes = pd.Index(periods).get_indexer(labels)
+    exceedance = tall_nde(df, standards) == "E"
+    valid = periodCodes >= 0
+
+    sampled = np.zeros((len(addresses), len(periods)), dtype = bool)
+    sampled[addressCodes[valid], periodCodes[valid]] = True
+    exceeded = np.zeros((len(addresses), len(periods)), dtype = bool)
+    exceeded[addressCodes[valid & exceedance], periodCodes[valid & exceedance]] = True
+
+    dates = df["Collect_Date"].to_numpy(dtype = "datetime64[ns]")
+    lastSample = np.full(len(addresses), np.datetime64("NaT"), dtype = "datetime64[ns]")
+    lastExceedance = lastSample.copy()
+    order = np.argsort(dates, kind = "mergesort")
+    # Later dates overwrite earlier ones, so each address ends up with its latest
+    lastSample[addressCodes[order]] = dates[order]
+    eOrder = order[exceedance[order]]
+    lastExceedance[addressCodes[eOrder]] = dates[eOrder]
+
+    return {
+        "addresses": np.asarray(addresses, dtype = object),
+        "periods": periods,
+        "sampled": np.packbits(sampled, axis = 1),
+        "exceeded": np.packbits(exceeded, axis = 1),
+        "lastSample": lastSample,
+        "lastExceedance": lastExceedance,
+    }
+
+
+def period_mask(coverage, periods):
+    # Packed bits with the given period positions set, to AND against the coverage rows
+    bits = np.zeros(len(coverage["periods"]), dtype = bool)
+    bits[periods] = True
+    return np.packbits(bits)
+
+
+def sampled_in(coverage, periods):
+    # Boolean per address: sampled in any of the given period positions
+    return (coverage["sampled"] & period_mask(coverage, periods)).any(axis = 1)
+
+
+def missed_recent(coverage, n = missedPeriods):
+    # AddressIDs with no sample in any of the last n periods (addresses only ever sampled before then, i.e. dropped out of sampling)
+    recent = list(range(max(len(coverage["periods"]) - n, 0), len(coverage["periods"])))
+    return coverage["addresses"][~sampled_in(coverage, recent)]
+
+
+def overdue_followups(coverage, days = followupDays, asOf = None):
+    # Addresses whose latest E hasn't been followed by another sample and is more than "days" days old (as of today by default)
+    asOf = np.datetime64(pd.Timestamp.now() if asOf is None else pd.Timestamp(asOf), "ns")
+    lastE = coverage["lastExceedance"]
+    hasE = ~np.isnat(lastE)
+    # An address's latest sample is after its latest E exactly when it was resampled since
+    noFollowup = hasE & ~(coverage["lastSample"] > lastE)
+    overdue = noFollowup & (lastE + np.timedelta64(days, "D") < asOf)
+    out = pd.DataFrame({"AddressID": coverage["addresses"][overdue], "Last_Exceedance": lastE[overdue]})
+    out["Days_Since"] = (asOf - out["Last_Exceedance"].to_numpy()) // np.timedelta64(1, "D")
+    return out.sort_values("Days_Since", ascending = False).reset_index(drop = True)
+
+
+def never_sampled(coverage, siteAddresses):
+    # AddressIDs in the site's address set that have no sample at all
+    siteAddresses = np.asarray(pd.Series(siteAddresses).dropna().unique(), dtype = object)
+    return siteAddresses[~np.isin(siteAddresses, coverage["addresses"])]
+
+
+def coverage_table(coverage):
+    # The coverage as a readable table: one row per address, one column per period, "E" (exceedance), "X" (sampled) or ""
+    sampled = np.unpackbits(coverage["sampled"], axis = 1, count = len(coverage["periods"])).astype(bool)
+    exceeded = np.unpackbits(coverage["exceeded"], axis = 1, count = len(coverage["periods"])).astype(bool)
+    cells = np.where(exceeded, "E", np.where(sampled, "X", ""))
+    return pd.DataFrame(cells, index = pd.Index(coverage["addresses"], name = "AddressID"), columns = [str(p) for p in coverage["periods"]]).reset_index()
+
+
+# Check the site's coverage (only when this is run as a script, so the functions above can be imported by other scripts)
+
+if __name__ == "__main__":
+    import arcpy # Only available in ArcGIS Pro's Python environment
+
+    fields = ["AddressID", "Sampling_Round", "Collect_Date", "Analyte_Abbrev", "Result_Num"]
+    df = pd.DataFrame.from_records(data = arcpy.da.SearchCursor(location + "/" + gdb + "/" + samplesFC, fields), columns = fields)
+    with arcpy.da.SearchCursor(location + "/" + gdb + "/" + addressesFC, ["AddressID"], where_clause = "\"Site\" = '" + site + "'") as cursor:
+        siteAddresses = [row[0] for row in cursor]
+
+    coverage = build_coverage(df, load_standards())
+    missed = pd.DataFrame({"AddressID": missed_recent(coverage)})
+    overdue = overdue_followups(coverage)
+    never = pd.DataFrame({"AddressID": never_sampled(coverage, siteAddresses)})
+
+    print(len(coverage["addresses"]), "sampled addresses over", len(coverage["periods"]), "periods")
+    print(len(missed), "addresses missed in the last", missedPeriods, "periods")
+    print(len(overdue), "addresses with an E and no follow-up within", followupDays, "days")
+    print(len(never), "site addresses never sampled")
+
+    outpath = location + "/" + site_ + "_Coverage" + ext
+    with pd.ExcelWriter(outpath) as writer:
+        missed.to_excel(writer, sheet_name = "MissedRecent", index = False)
+        overdue.to_excel(writer, sheet_name = "OverdueFollowups", index = False)
+        never.to_excel(writer, sheet_name = "NeverSampled", index = False)
+        coverage_table(coverage).to_excel(writer, sheet_name = "Coverage", index = False)
+    print("Wrote", outpath)
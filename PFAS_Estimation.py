@@ -0,0 +1,174 @@
+# This script is used for estimating PFAS levels (e.g. PFOA and PFOS) where there aren't any samples, from the results at nearby sampled addresses.
+
+# Estimates are inverse distance weighted (IDW): the estimate at a point is the weighted mean of the nearest sampled addresses' values, each
+# weighted by 1 / distance^power, using at most "neighbors" addresses within maxDistance meters. Each sampled address contributes one value per
+# analyte: its latest result (statistic = "latest") or its highest result (statistic = "max"), with non-detects as 0.
+# Estimates can be made at:
+#   - the site's PFAS_Addresses points that have no samples (gridSpacing = None)
+#   - a regular grid of points gridSpacing meters apart over the sampled area
+# The output is a point layer (see the estimate stages in PFAS_Pipeline) with <analyte>_Est, <analyte>_Est_Neighbors (how many sampled addresses
+# went into it; 0 = too far from any sample to estimate) and Nearest_Sample_m.
+
+# These are rough estimates for mapping, not results. They don't account for groundwater flow, well depth, or anything else but distance.
+
+# Neighbors are found with a k-d tree (scipy's cKDTree) over the sampled points and the weighting is done on whole arrays at once, so even a
+# statewide grid takes seconds. Longitude/latitude (WGS 1984) are projected to meters with an equirectangular projection centered on the data,
+# which is well within a percent over a state the size of Michigan.
+
+# Last updated 10/18/2026
+
+import numpy as np
+import pandas as pd # Used for the estimation
+from scipy.spatial import cKDTree # Used for finding the nearest sampled addresses
+
+from PFAS_Standards import analyte_field_name
+
+# Things to definitely change per site and user
+
+# Geodatabase location and name, and the tall feature class with the results
+location = r"C:\Users\JohnsonN35\Local_Work\PFAS_Script"
+gdb = "PFAS.gdb"
+samplesFC = "Grayling_GAAF_SiteSummary_Copy_AllResultsFlatFile_XYEvent_FC"
+
+# Master PFAS address layer and the site's name in its "Site" field (None estimates at every address in the layer)
+addressesFC = "PFAS_Addresses"
+site = "Grayling GAAF"
+
+# Name of the site (used for the output layer name)
+site_ = "Grayling_GAAF"
+
+# Analytes to estimate
+analytes = ["PFOA", "PFOS"]
+
+# Each sampled address's value: "latest" or "max"
+statistic = "latest"
+
+# IDW settings
+power = 2
+neighbors = 8
+maxDistance = 2000 # Meters; points farther than this from every sample aren't estimated
+
+# None estimates at unsampled addresses; a number of meters estimates on a grid instead
+gridSpacing = None
+
+earthRadius = 6371008.8 # Meters (mean radius)
+
+
+def project(lon, lat, lat0):
+    # Equirectangular projection of longitude/latitude to meters, true to scale along latitude lat0
+    lon = np.radians(np.asarray(lon, dtype = float))
+    lat = np.radians(np.asarray(lat, dtype = float))
+    return np.column_stack([earthRadius * lon * np.cos(np.radians(lat0)), earthRadius * lat])
+
+
+def unproject(xy, lat0):
+    lon = np.degrees(xy[:, 0] / (earthRadius * np.cos(np.radians(lat0))))
+    lat = np.degrees(xy[:, 1] / earthRadius)
+    return lon, lat
+
+
+def sampled_values(tall, analytes = analytes, statistic = statistic):
+    # One row per sampled address with its coordinates and a value per analyte (named by analyte_field_name), from the tall results
+    df = tall[tall["Analyte_Abbrev"].isin(analytes) & tall["AddressID"].notna() & tall["Result_Num"].notna()
+        & tall["displayx"].notna() & tall["displayy"].notna()]
+    if statistic == "latest":
+        # The latest sample, taking the highest result if there were several that day
+        df = df.sort_values(["Collect_Date", "Result_Num"], kind = "mergesort").drop_duplicates(["AddressID", "Analyte_Abbrev"], keep = "last")
+    elif statistic != "max":
+        raise ValueError("statistic must be 'latest' or 'max', not " + repr(statistic))
+
+    values = df.pivot_table(index = "AddressID", columns = "Analyte_Abbrev", values = "Result_Num", aggfunc = "max")
+    values.columns = [analyte_field_name(a) for a in values.columns]
+    points = df.groupby("AddressID")[["displayx", "displayy"]].first()
+    return points.join(values).reset_index()
+
+
+def idw(sampleXY, sampleValues, targetXY, neighbors = neighbors, power = power, maxDistance = maxDistance, tree = None):
+    # IDW estimates at targetXY from the samples (NaN values are skipped). Returns estimates (NaN where no sample is in range) and neighbor counts.
+    have = ~np.isnan(sampleValues)
+    sampleXY, sampleValues = sampleXY[have], sampleValues[have]
+    k = min(neighbors, len(sampleXY))
+    if k == 0 or len(targetXY) == 0:
+        return np.full(len(targetXY), np.nan), np.zeros(len(targetXY), dtype = int)
+    if tree is None or not have.all():
+        tree = cKDTree(sampleXY)
+
+    distances, indexes = tree.query(targetXY, k = k, distance_upper_bound = maxDistance)
+    distances, indexes = distances.reshape(len(targetXY), k), indexes.reshape(len(targetXY), k)
+    found = np.isfinite(distances) # Missing neighbors come back as an infinite distance
+    values = sampleValues[np.where(found, indexes, 0)]
+
+    with np.errstate(divide = "ignore"):
+        weights = np.where(found, 1 / np.power(distances, power), 0)
+    # A target on top of a sample gets that sample's value
+    exact = found & (distances == 0)
+    onSample = exact.any(axis = 1)
+    weights[onSample] = exact[onSample]
+
+    total = weights.sum(axis = 1)
+    with np.errstate(invalid = "ignore"):
+        estimates = (weights * values).sum(axis = 1) / total
+    return np.where(total > 0, estimates, np.nan), found.sum(axis = 1)
+
+
+def grid_points(sampleXY, spacing, margin = maxDistance):
+    # A regular grid, spacing meters apart, over the samples' extent plus margin
+    low = sampleXY.min(axis = 0) - margin
+    high = sampleXY.max(axis = 0) + margin
+    xs = np.arange(low[0], high[0] + spacing, spacing)
+    ys = np.arange(low[1], high[1] + spacing, spacing)
+    gx, gy = np.meshgrid(xs, ys)
+    return np.column_stack([gx.ravel(), gy.ravel()])
+
+
+def estimate(samples, targets = None, analytes = analytes, gridSpacing = gridSpacing, neighbors = neighbors, power = power, maxDistance = maxDistance):
+    # Estimates from sampled_values() at the target addresses (AddressID, displayx, displayy) that have no samples, or on a grid if gridSpacing is set.
+    # Returns a dataframe with Estimate_ID, displayx, displayy, <analyte>_Est, <analyte>_Est_Neighbors and Nearest_Sample_m.
+    # Without any samples there's nothing to estimate from: no grid, and every address gets NaN with 0 neighbors
+    lat0 = samples["displayy"].mean() if len(samples) else 0.0
+    sampleXY = project(samples["displayx"], samples["displayy"], lat0)
+
+    if gridSpacing and not len(samples):
+        out = pd.DataFrame({"Estimate_ID": pd.Series(dtype = object), "displayx": pd.Series(dtype = float), "displayy": pd.Series(dtype = float)})
+        targetXY = np.empty((0, 2))
+    elif gridSpacing:
+        targetXY = grid_points(sampleXY, gridSpacing, maxDistance)
+        lon, lat = unproject(targetXY, lat0)
+        out = pd.DataFrame({"Estimate_ID": ["G" + str(i) for i in range(len(targetXY))], "displayx": lon, "displayy": lat})
+    else:
+        targets = targets[~targets["AddressID"].isin(samples["AddressID"]) & targets["displayx"].notna() & targets["displayy"].notna()]
+        targets = targets.drop_duplicates("AddressID")
+        targetXY = project(targets["displayx"], targets["displayy"], lat0)
+        out = pd.DataFrame({"Estimate_ID": targets["AddressID"].astype(str).to_numpy(), "displayx": targets["displayx"].to_numpy(),
+            "displayy": targets["displayy"].to_numpy()})
+
+    tree = cKDTree(sampleXY) if len(samples) else None
+    for analyte in analytes:
+        field = analyte_field_name(analyte)
+        values = samples[field].to_numpy(dtype = float) if field in samples.columns else np.full(len(samples), np.nan)
+        out[field + "_Est"], out[field + "_Est_Neighbors"] = idw(sampleXY, values, targetXY, neighbors, power, maxDistance, tree)
+
+    nearest = tree.query(targetXY, k = 1)[0] if tree is not None and len(targetXY) else np.full(len(targetXY), np.nan)
+    out["Nearest_Sample_m"] = np.round(nearest, 1)
+    return out
+
+
+# Estimate for the site (only when this is run as a script, so the functions above can be imported by other scripts)
+
+if __name__ == "__main__":
+    import arcpy # Only available in ArcGIS Pro's Python environment
+    import PFAS_Pipeline as pipeline
+
+    fields = ["AddressID", "Collect_Date", "Analyte_Abbrev", "Result_Num", "displayx", "displayy"]
+    tall = pd.DataFrame.from_records(data = arcpy.da.SearchCursor(location + "/" + gdb + "/" + samplesFC, fields), columns = fields)
+    where = "\"Site\" = '" + site + "'" if site else None
+    addressFields = ["AddressID", "displayx", "displayy"]
+    with arcpy.da.SearchCursor(location + "/" + gdb + "/" + addressesFC, addressFields, where_clause = where) as cursor:
+        addresses = pd.DataFrame.from_records(data = cursor, columns = addressFields)
+
+    samples = sampled_values(tall)
+    out = estimate(samples, addresses)
+    print(len(samples), "sampled addresses;", out[[analyte_field_name(a) + "_Est" for a in analytes]].notna().sum().to_dict(), "estimates")
+
+    fcName = site_ + "_Estimates_FC"
+    pipeline.write_feature_class(out, location + "/" + gdb, fcName, ["Estimate_ID"], location + "/PFAS_Manifests/" + fcName)
@@ -0,0 +1,126 @@
+# This script is used for pairing POST-filter samples with the PRE-filter sample taken at the same address, and working out how well the
+# filter is removing each analyte.
+
+# samplesDQ in PFAS_ARFF_Tall only keeps PRE and Unknown samples, so the POST samples from filter installations never get used. This script reads
+# the tall results without that filter, and for each POST sample finds the closest PRE sample at the same address (Sampled_Address_Clean) taken
+# within maxPairDays before it (a sorted as-of merge on Collect_Date). For each analyte in the pair it works out:
+#   Removal_Pct     (PRE - POST) / PRE * 100; blank when PRE is non-detect, since there's nothing to measure removal against
+#   Breakthrough    the POST sample has a detection (Result_Num > 0), i.e. something is getting through the filter
+# Results are joined to Current_AltWaterRec so they can be used for filter-maintenance scheduling (e.g. addresses with breakthrough,
+# or where the last POST sample is getting old).
+
+# Samples are paired by address rather than AddressID, since the POST samples never got an AddressID (the join in PFAS_ARFF_Tall ran with
+# samplesDQ on). The pipeline's filter_pairs stage (see PFAS_Pipeline) does the same pairing from the read stage with its own PRE/POST filter,
+# joins the samples to PFAS_Addresses like the join stage does, and writes the address summary as a point layer for maintenance scheduling.
+
+# Last updated 10/18/2026
+
+import pandas as pd # Used for the pairing
+
+# Things to definitely change per site and user
+
+# Geodatabase location and name, and the tall table with the PRE and POST samples
+location = r"C:\Users\JohnsonN35\Local_Work\PFAS_Script"
+gdb = "PFAS.gdb"
+samplesTable = "Grayling_GAAF_SiteSummary_Copy_AllResultsFlatFile"
+
+# Name of the site (used for files)
+site_ = "Grayling_GAAF"
+
+# Only pair a POST sample with a PRE sample taken at most this many days before it
+maxPairDays = 365
+
+# Flag an address for filter maintenance if its last POST sample is older than this many days
+maintenanceDays = 365
+
+# Samples are paired at the same value of this field
+pairKey = "Sampled_Address_Clean"
+
+ext = ".xlsx"
+
+fields = ["AddressID", "Sampled_Address_Clean", "Lab_Sample_ID", "Sampling_Round", "Sample_PrePost", "Collect_Date", "Analyte_Group",
+    "Analyte_Abbrev", "Result_Num", "Current_AltWaterRec"]
+
+
+def sample_dates(df, prePost):
+    # One row per sample (Lab_Sample_ID) of the given type, sorted by Collect_Date for the as-of merge
+    samples = df.loc[df["Sample_PrePost"] == prePost, [pairKey, "Lab_Sample_ID", "Collect_Date"]]
+    samples = samples.dropna(subset = [pairKey, "Collect_Date"]).drop_duplicates("Lab_Sample_ID")
+    return samples.sort_values("Collect_Date", kind = "mergesort")
+
+
+def pair_samples(df, maxPairDays = maxPairDays):
+    # Match each POST sample with the latest PRE sample at the same address taken on or before it, within maxPairDays.
+    # Returns one row per POST sample: Sampled_Address_Clean, POST_Sample_ID, POST_Date, PRE_Sample_ID, PRE_Date (blank if no PRE sample matched).
+    post = sample_dates(df, "POST").rename(columns = {"Lab_Sample_ID": "POST_Sample_ID", "Collect_Date": "POST_Date"})
+    pre = sample_dates(df, "PRE").rename(columns = {"Lab_Sample_ID": "PRE_Sample_ID", "Collect_Date": "PRE_Date"})
+
+    pairs = pd.merge_asof(post, pre, left_on = "POST_Date", right_on = "PRE_Date", by = pairKey, direction = "backward",
+        tolerance = pd.Timedelta(days = maxPairDays))
+    return pairs.sort_values([pairKey, "POST_Date"]).reset_index(drop = True)
+
+
+def treatment_efficiency(df, pairs):
+    # Per-analyte PRE and POST results for each pair, with Removal_Pct and Breakthrough. POST samples without a PRE sample are kept
+    # (blank PRE result and Removal_Pct) so their breakthrough still counts.
+    results = df[["Lab_Sample_ID", "Analyte_Abbrev", "Result_Num"]].drop_duplicates(["Lab_Sample_ID", "Analyte_Abbrev"])
+
+    postResults = pairs.merge(results.rename(columns = {"Lab_Sample_ID": "POST_Sample_ID", "Result_Num": "POST_Result_Num"}), on = "POST_Sample_ID")
+    efficiency = postResults.merge(results.rename(columns = {"Lab_Sample_ID": "PRE_Sample_ID", "Result_Num": "PRE_Result_Num"}),
+        on = ["PRE_Sample_ID", "Analyte_Abbrev"], how = "left")
+
+    pre = efficiency["PRE_Result_Num"].where(efficiency["PRE_Result_Num"] > 0)
+    efficiency["Removal_Pct"] = (pre - efficiency["POST_Result_Num"]) / pre * 100
+    efficiency["Breakthrough"] = efficiency["POST_Result_Num"] > 0
+    return efficiency
+
+
+def address_summary(df, pairs, efficiency, maintenanceDays = maintenanceDays, asOf = None):
+    # One row per address with POST samples: the latest POST date, whether any analyte broke through on the latest POST sample, the lowest
+    # removal on it, and the address's latest AddressID, Current_AltWaterRec and (if df has them) displayx/displayy.
+    # Maintenance_Due is set for breakthrough or a latest POST sample older than maintenanceDays.
+    asOf = pd.Timestamp.now().normalize() if asOf is None else pd.Timestamp(asOf)
+
+    latest = pairs.sort_values("POST_Date").drop_duplicates(pairKey, keep = "last")
+    latestEff = efficiency[efficiency["POST_Sample_ID"].isin(latest["POST_Sample_ID"])].copy()
+    latestEff["Breakthrough_Analyte"] = latestEff["Analyte_Abbrev"].where(latestEff["Breakthrough"])
+    perSample = latestEff.groupby("POST_Sample_ID").agg(Breakthrough = ("Breakthrough", "any"), Min_Removal_Pct = ("Removal_Pct", "min"),
+        Breakthrough_Analytes = ("Breakthrough_Analyte", lambda a: ", ".join(sorted(a.dropna()))))
+
+    summary = latest.merge(perSample, how = "left", left_on = "POST_Sample_ID", right_index = True)
+    summary["Breakthrough"] = summary["Breakthrough"].fillna(False).astype(bool)
+    summary["Days_Since_POST"] = (asOf - summary["POST_Date"]).dt.days
+    summary["Maintenance_Due"] = summary["Breakthrough"] | (summary["Days_Since_POST"] > maintenanceDays)
+
+    # The last value given for each address (groupby's last() skips blanks)
+    addressFields = [f for f in ["AddressID", "Current_AltWaterRec", "displayx", "displayy"] if f in df.columns]
+    addresses = df.sort_values("Collect_Date", kind = "mergesort").groupby(pairKey)[addressFields].last()
+    return summary.merge(addresses, how = "left", left_on = pairKey, right_index = True)
+
+
+# Pair the site's samples (only when this is run as a script, so the functions above can be imported by other scripts)
+
+if __name__ == "__main__":
+    import arcpy # Only available in ArcGIS Pro's Python environment
+
+    where = "\"Analyte_Group\" = 'PFAS' And \"Sample_PrePost\" In ('PRE', 'POST')"
+    df = pd.DataFrame.from_records(data = arcpy.da.SearchCursor(location + "/" + gdb + "/" + samplesTable, fields, where_clause = where), columns = fields)
+    df["Sampled_Address_Clean"] = df["Sampled_Address_Clean"].astype("string").str.upper() # As in PFAS_ARFF_Tall
+
+    pairs = pair_samples(df)
+    efficiency = treatment_efficiency(df, pairs)
+    summary = address_summary(df, pairs, efficiency)
+
+    print(len(pairs), "POST samples;", int(pairs["PRE_Sample_ID"].notna().sum()), "paired with a PRE sample")
+    print(int(summary["Breakthrough"].sum()), "addresses with breakthrough on their latest POST sample")
+    print(int(summary["Maintenance_Due"].sum()), "addresses due for filter maintenance")
+
+    outpath = location + "/" + site_ + "_FilterPairs" + ext
+    with pd.ExcelWriter(outpath) as writer:
+        summary.to_excel(writer, sheet_name = "Addresses", index = False)
+        efficiency.to_excel(writer, sheet_name = "Efficiency", index = False)
+        pairs.to_excel(writer, sheet_name = "Pairs", index = False)
+    print("Wrote", outpath)
+
+    # Put the address summary in the gdb too, so it can be joined to the address layer for maintenance scheduling
+    arcpy.conversion.ExportTable(outpath + "/Addresses$", location + "/" + gdb + "/" + site_ + "_FilterPairs")
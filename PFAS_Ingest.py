@@ -0,0 +1,199 @@
+# This script is used for reading a folder of raw lab EDD (electronic data deliverable) files straight into the "tall" table, instead of first
+# pasting them into the site summary workbook by hand.
+
+# Every lab lays its EDDs out differently, so each lab gets a profile in labProfiles below:
+#   pattern     file name pattern (e.g. "*_ALS_*.csv") for picking the profile; the first profile that matches a file is used
+#   skipRows    rows to skip above the header
+#   sheet       sheet to read for .xlsx/.xls files
+#   columns     the lab's column name: tall field name
+#   required    (optional) the lab columns that have to be there; defaults to all of the mapped columns
+#   constants   tall field: value, set on every row (e.g. Lab_Name)
+#   defaults    tall field: value, filled in where the lab left it blank
+#   nonDetects  Result values that mean a non-detect (Result_Num = 0, like in the site summary workbook)
+# Add a profile when a new lab starts sending EDDs. A file that doesn't match any profile, or is missing a mapped column, stops the run with
+# a list of every problem file, so nothing gets half loaded.
+
+# The files are read in parallel, one per process (ProcessPoolExecutor), so a big delivery is read about as many times faster as there are cores.
+# Each row keeps the name of the file it came from in Data_File_Name. Run this as a standalone script (e.g. with ArcGIS Pro's propy.bat), not from
+# the Python window in Pro, since the worker processes need to be able to import this file.
+
+# The result has the same fields as the "AllResultsFlatFile" sheet, so it can go straight into the PFAS_Pipeline stages (set eddDir for the
+# read stage) or be saved as a workbook for PFAS_ARFF_Tall.
+
+# Last updated 10/18/2026
+
+import fnmatch
+import glob
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor # Used for reading the files in parallel
+
+import numpy as np
+import pandas as pd # Used for reading and re-shaping the EDDs
+
+# Things to definitely change per site and user
+
+# Folder of raw lab EDDs, and where to save the combined table
+eddDir = r"C:\Users\JohnsonN35\Local_Work\PFAS_Script\EDDs"
+location = r"C:\Users\JohnsonN35\Local_Work\PFAS_Script"
+
+# Name of the site (used for files)
+site_ = "Grayling_GAAF"
+
+ext = ".xlsx"
+
+# Number of processes; None uses every core
+workers = None
+
+# EDD file types read
+eddExtensions = [".csv", ".xlsx", ".xls"]
+
+# Fields of the "AllResultsFlatFile" sheet, in order
+tallFields = ['Site','Site_Name','Site_Subarea','Data_File_Name','Report_File_Name','Lab_Name','Lab_Work_Order','Lab_Sample_ID','Field_Sample_ID',
+    'Field_Location_Code','Sampled_Address_Clean','Sampling_Round','Sample_PrePost','Duplicate','Collect_Date','Collected_By','Matrix',
+    'Analyte_Group','Analysis_Method','Analyte_Abbrev','Result','Result_Num','Result_Unit','Result_Qualifier','Detect_Flag','RDL','LOQ',
+    'Analyte_NDE','Sample_NDE','Sample_TotalPFAS','DEH_Comment','Address_NDE','Current_AltWaterRec']
+
+numericFields = ["Result_Num", "RDL", "LOQ", "Sample_TotalPFAS"]
+
+# Lab profiles; see the top of this script
+labProfiles = {
+    # EDDs already in the EGLE EDD layout (the same field names as the site summary workbook)
+    "egle": {
+        "pattern": "*_EGLE_EDD*",
+        "skipRows": 0,
+        "sheet": 0,
+        "columns": {field: field for field in tallFields if field != "Data_File_Name"},
+        "required": ["Lab_Sample_ID", "Sampled_Address_Clean", "Collect_Date", "Matrix", "Analysis_Method", "Analyte_Abbrev", "Result",
+            "Result_Unit"],
+        "constants": {},
+        "defaults": {"Analyte_Group": "PFAS", "Sample_PrePost": "Unknown"},
+        "nonDetects": ["ND", "U"],
+    },
+    # Example of a lab with its own layout; check the column names against a real delivery before using it
+    "lab_example": {
+        "pattern": "*_LabExample_*",
+        "skipRows": 0,
+        "sheet": 0,
+        "columns": {
+            "WorkOrder": "Lab_Work_Order",
+            "LabSampleID": "Lab_Sample_ID",
+            "ClientSampleID": "Field_Sample_ID",
+            "Location": "Sampled_Address_Clean",
+            "CollectionDate": "Collect_Date",
+            "Matrix": "Matrix",
+            "Method": "Analysis_Method",
+            "Analyte": "Analyte_Abbrev",
+            "Result": "Result",
+            "Units": "Result_Unit",
+            "Qualifier": "Result_Qualifier",
+            "RL": "RDL",
+            "LOQ": "LOQ",
+        },
+        "constants": {"Lab_Name": "Lab Example"},
+        "defaults": {"Analyte_Group": "PFAS", "Sample_PrePost": "Unknown"},
+        "nonDetects": ["ND", "<RL", "U"],
+    },
+}
+
+
+def edd_files(eddDir, extensions = eddExtensions):
+    # EDD files in the folder, in name order (Excel lock files like "~$x.xlsx" are skipped)
+    files = [f for f in glob.glob(os.path.join(eddDir, "*")) if os.path.splitext(f)[1].lower() in extensions]
+    return sorted(f for f in files if not os.path.basename(f).startswith("~$"))
+
+
+def profile_for(path, profiles = labProfiles):
+    # Name of the first profile whose pattern matches the file name, or None
+    fileName = os.path.basename(path).lower()
+    for profileName, profile in profiles.items():
+        if fnmatch.fnmatch(fileName, profile["pattern"].lower()):
+            return profileName
+    return None
+
+
+def read_edd(path, profile):
+    # Read one EDD into the tall fields. Raises ValueError if a required column isn't in the file.
+    if os.path.splitext(path)[1].lower() == ".csv":
+        raw = pd.read_csv(path, skiprows = profile["skipRows"], dtype = str, keep_default_na = False, na_values = [""])
+    else:
+        raw = pd.read_excel(path, sheet_name = profile["sheet"], skiprows = profile["skipRows"], dtype = str)
+    raw.columns = [str(c).strip() for c in raw.columns]
+
+    missing = [c for c in profile.get("required", profile["columns"]) if c not in raw.columns]
+    if missing:
+        raise ValueError(os.path.basename(path) + " is missing column(s) " + ", ".join(missing))
+
+    df = raw[[c for c in profile["columns"] if c in raw.columns]].rename(columns = profile["columns"])
+    df = df.reindex(columns = tallFields)
+    for field, value in profile["constants"].items():
+        df[field] = value
+    for field, value in profile["defaults"].items():
+        df[field] = df[field].fillna(value)
+    df["Data_File_Name"] = os.path.basename(path)
+
+    # Result_Num: the number in Result if the lab didn't give one, and 0 for non-detects
+    for field in numericFields:
+        df[field] = pd.to_numeric(df[field], errors = "coerce")
+    result = df["Result"].astype("string").str.strip()
+    df["Result_Num"] = df["Result_Num"].fillna(pd.to_numeric(result, errors = "coerce"))
+    nonDetect = result.str.upper().isin([v.upper() for v in profile["nonDetects"]]).fillna(False)
+    nonDetect |= result.str.startswith("<", na = False) # e.g. "<2.0"
+    nonDetect |= df["Detect_Flag"].astype("string").str.upper().eq("N").fillna(False)
+    df.loc[nonDetect.to_numpy(dtype = bool), "Result_Num"] = 0
+
+    df["Collect_Date"] = pd.to_datetime(df["Collect_Date"], errors = "coerce")
+    return df
+
+
+def read_edd_timed(path, profile):
+    # read_edd for the process pool: returns the frame and how long the read took
+    start = time.perf_counter()
+    df = read_edd(path, profile)
+    return df, time.perf_counter() - start
+
+
+def ingest(eddDir, profiles = labProfiles, workers = workers):
+    # Read every EDD in the folder in parallel and stack them into one tall frame. Returns the frame and a per-file dataframe of
+    # Data_File_Name, Profile, Rows and Seconds. Raises ValueError listing every file that didn't match a profile or couldn't be read.
+    files = edd_files(eddDir)
+    matched = {path: profile_for(path, profiles) for path in files}
+    problems = [os.path.basename(path) + " doesn't match any lab profile" for path, profileName in matched.items() if profileName is None]
+
+    frames = {}
+    log = []
+    with ProcessPoolExecutor(max_workers = workers) as pool:
+        futures = {path: pool.submit(read_edd_timed, path, profiles[profileName]) for path, profileName in matched.items() if profileName}
+        for path, future in futures.items():
+            try:
+                frames[path], seconds = future.result()
+            except Exception as e:
+                problems.append(os.path.basename(path) + ": " + str(e))
+                continue
+            log.append({"Data_File_Name": os.path.basename(path), "Profile": matched[path], "Rows": len(frames[path]), "Seconds": seconds})
+
+    if problems:
+        raise ValueError("Couldn't ingest " + str(len(problems)) + " EDD file(s):\n  " + "\n  ".join(problems))
+
+    # Keep the files in name order so the result is the same however the processes finish
+    df = pd.concat([frames[path] for path in files if path in frames], ignore_index = True) if frames else pd.DataFrame(columns = tallFields)
+    return df, pd.DataFrame(log, columns = ["Data_File_Name", "Profile", "Rows", "Seconds"])
+
+
+# Ingest the folder (only when this is run as a script, so the functions above can be imported by other scripts, including the worker processes)
+
+if __name__ == "__main__":
+    start = time.perf_counter()
+    df, log = ingest(eddDir)
+    seconds = time.perf_counter() - start
+
+    print(log.to_string(index = False))
+    print("{:,} rows from {} files in {:.1f} s ({:.1f} s of reading across {} processes)".format(len(df), len(log), seconds,
+        log["Seconds"].sum(), workers or os.cpu_count()))
+    print("Files with no results:", list(log.loc[log["Rows"] == 0, "Data_File_Name"]) or "none")
+    print("Rows without a Result_Num:", int(np.sum(df["Result_Num"].isna())))
+
+    # Same sheet name as the site summary workbook, so PFAS_ARFF_Tall can read it with headerRow = 0 and skipRows = 0
+    outpath = location + "/" + site_ + "_EDDs" + ext
+    df.to_excel(outpath, sheet_name = "AllResultsFlatFile", index = False)
+    print("Wrote", outpath)
@@ -0,0 +1,92 @@
+# This script is used for working out which rows of an output (the tall feature class or <site>_Pivoted_FC) actually changed since it was last written.
+
+# Each run used to overwrite the output feature classes wholesale, so the published layer had to be fully replaced even when only a handful of
+# samples changed. Here every output row gets a hash of its values, keyed by Lab_Sample_ID (wide) or Lab_Sample_ID + Analyte_Abbrev (tall).
+# The hashes are saved in a manifest next to the output. On the next run the new hashes are compared with the manifest (a hash join, so linear
+# time) to get three sets:
+#   inserts    keys that are new
+#   updates    keys that are in both but whose values changed
+#   deletes    keys that are gone
+# Writing and publishing then only has to touch those rows (see write_feature_class in PFAS_Pipeline).
+
+# Last updated 10/18/2026
+
+import json
+import os
+
+import numpy as np
+import pandas as pd # Used for hashing and comparing the rows
+
+# Output key fields
+wideKeys = ["Lab_Sample_ID"]
+tallKeys = ["Lab_Sample_ID", "Analyte_Abbrev"]
+
+# Separates key parts in the combined key; a character that doesn't show up in sample IDs or analyte names
+keySeparator = "\x1f"
+
+
+def row_keys(df, keyFields):
+    # One string key per row; raises ValueError if any key is repeated, since a repeated key can't be diffed
+    keys = df[keyFields[0]].astype("string")
+    for field in keyFields[1:]:
+        keys = keys + keySeparator + df[field].astype("string")
+    keys = keys.fillna("")
+
+    repeated = keys[keys.duplicated()]
+    if len(repeated):
+        raise ValueError("Output key " + "+".join(keyFields) + " isn't unique; repeated: " + ", ".join(repeated.head(10).str.replace(keySeparator, "+")))
+    return keys.to_numpy(dtype = object)
+
+
+def canonical(df):
+    # Put every field in one representation so a value that comes back as a different dtype (e.g. an int column read back as float)
+    # hashes the same: numbers as float64, dates as int64 nanoseconds, everything else as text
+    out = pd.DataFrame(index = df.index)
+    for field in sorted(df.columns):
+        values = df[field]
+        if pd.api.types.is_bool_dtype(values) or pd.api.types.is_numeric_dtype(values):
+            out[field] = values.astype("float64")
+        elif pd.api.types.is_datetime64_any_dtype(values):
+            out[field] = values.astype("datetime64[ns]").astype("int64")
+        else:
+            out[field] = values.astype("string").fillna("\x00") # Keep a missing value different from an empty string
+    return out
+
+
+def row_hashes(df, keyFields, valueFields = None):
+    # DataFrame of Key and Hash (uint64 as text) for every row; valueFields defaults to every field
+    valueFields = list(df.columns) if valueFields is None else valueFields
+    hashes = pd.util.hash_pandas_object(canonical(df[valueFields]), index = False).to_numpy()
+    return pd.DataFrame({"Key": row_keys(df, keyFields), "Hash": hashes.astype(np.uint64).astype(str)})
+
+
+def load_manifest(path):
+    # Previous hashes and fields for an output, or (None, None) if it hasn't been written with a manifest yet
+    if not os.path.exists(path + ".csv"):
+        return None, None
+    hashes = pd.read_csv(path + ".csv", dtype = str, keep_default_na = False)
+    with open(path + ".json") as f:
+        meta = json.load(f)
+    return hashes, meta["fields"]
+
+
+def save_manifest(path, hashes, fields):
+    os.makedirs(os.path.dirname(path), exist_ok = True)
+    hashes.to_csv(path + ".csv.tmp", index = False)
+    os.replace(path + ".csv.tmp", path + ".csv")
+    with open(path + ".json", "w") as f:
+        json.dump({"fields": list(fields), "rows": len(hashes)}, f)
+
+
+def diff(newHashes, oldHashes):
+    # Compare new row hashes with the manifest's. Returns a dictionary of "inserts", "updates" and "deletes", each an array of keys.
+    merged = newHashes.merge(oldHashes, on = "Key", how = "outer", suffixes = ("", "_old"), indicator = True)
+    return {
+        "inserts": merged.loc[merged["_merge"] == "left_only", "Key"].to_numpy(dtype = object),
+        "updates": merged.loc[(merged["_merge"] == "both") & (merged["Hash"] != merged["Hash_old"]), "Key"].to_numpy(dtype = object),
+        "deletes": merged.loc[merged["_merge"] == "right_only", "Key"].to_numpy(dtype = object),
+    }
+
+
+def describe(changes):
+    return ", ".join(str(len(keys)) + " " + kind for kind, keys in changes.items())
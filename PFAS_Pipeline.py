@@ -0,0 +1,615 @@
+# This script is used for running the "tall" and "wide" PFAS processing (see "PFAS_ARFF_Tall" and "PFAS_ARFF_Wide") as a set of named stages:
+# read -> filter -> standardize -> join -> pivot -> nde -> write. The addresses stage feeds the join. The estimate stage (IDW estimates at
+# unsampled addresses, see PFAS_Estimation) works off the join and the addresses and is written as its own layer. The filter pairing (see
+# PFAS_FilterPairing) has its own chain from the read stage, since it needs the POST samples the filter stage drops:
+# read -> filter_prepost -> standardize_prepost -> join_prepost -> filter_pairs -> write_filter_pairs.
+
+# Each stage's output is cached on disk under a hash of its inputs plus its configuration. When you rerun the pipeline, only the stages downstream
+# of whatever changed are recomputed. For example, changing one MCL only reruns the nde and wide write stages; changing one matrix mapping reruns
+# standardize and everything after it, but not the Excel parse. Only the keepPerStage most recently used outputs of each stage are kept.
+
+# Set dryRun = True (or run with --dry-run) to print which stages will execute without running anything.
+
+# The processing here is the pandas version of what the two ArcGIS scripts do with definition queries and field calculations. If you add a new
+# standardization or query to those scripts, add it to the stage configuration below too.
+
+# Last updated 10/18/2026
+
+import hashlib # Used for hashing stage inputs and outputs
+import json
+import os
+import sys
+import time
+
+import pandas as pd # Used for all of the processing
+
+import PFAS_Estimation as estimation
+import PFAS_FilterPairing as filterPairing
+import PFAS_Ingest as ingest
+import PFAS_OutputDiff as outputDiff
+from PFAS_Standards import analyte_field_name, load_standards, wide_nde
+from PFAS_Units import convert_units, unitRegistry
+
+# Things to definitely change per site and user
+
+# Site summary workbook location (the cache folder and gdb are assumed to be in the same folder)
+location = r"C:\Users\JohnsonN35\Local_Work\PFAS_Script"
+
+# Site summary workbook file name
+name = "Grayling-GAAF_SiteSummary_Copy"
+
+# Geodatabase name
+gdb = "PFAS.gdb"
+
+# Name of the site; must match the "Site" field of the master PFAS address layer
+site = "Grayling GAAF"
+site_ = "Grayling_GAAF"
+
+# Show which stages would run without running them
+dryRun = False
+
+# Where cached stage outputs go; one folder per site
+cacheDir = location + "/PFAS_Cache/" + site_
+
+# Cached outputs kept per stage; older ones (least recently used first) are deleted so the cache folder doesn't grow forever
+keepPerStage = 3
+
+ext = ".xlsx"
+
+# Fields used for the wide pivot index
+# GRAYLING-SPECIFIC (leave out Report_File_Name since it contains invalid values)
+pivotIndex = ['Site','AddressID','Site_Name','Site_Subarea','Data_File_Name','Lab_Name','Lab_Work_Order','Lab_Sample_ID','Field_Sample_ID',
+    'Field_Location_Code','Duplicate','Sampled_Address_Clean','Sampling_Round','Sample_PrePost','Collect_Date','Collected_By','Matrix_Stdz',
+    'Analysis_Method_Stdz','Sample_NDE','Sample_TotalPFAS']
+
+# ALL OTHER SITES
+# pivotIndex = ['Site','AddressID','Site_Name','Site_Subarea','Data_File_Name','Report_File_Name','Lab_Name','Lab_Work_Order','Lab_Sample_ID',
+#     'Field_Sample_ID','Field_Location_Code','Duplicate','Sampled_Address_Clean','Sampling_Round','Sample_PrePost','Collect_Date','Collected_By',
+#     'Matrix_Stdz','Analysis_Method_Stdz','Sample_NDE','Sample_TotalPFAS']
+
+# Effective-dated standards (e.g. MCLs) used for the NDE fields; see PFAS_Standards
+standardsPath = os.path.join(os.path.dirname(os.path.abspath(__file__)), "PFAS_Standards.csv")
+
+# Stage configuration. Anything in a stage's config is part of its cache key, so changing a value here reruns that stage and everything after it.
+def site_stage_config(location, name, gdb, site, site_, overrides = None):
+    # Build the stage configuration for one site; overrides is an optional {stage: {setting: value}} dictionary for site-specific changes
+    config = {
+        "read": {
+            "path": location + "/" + name + ext,
+            "sheet": "AllResultsFlatFile",
+            "headerRow": 0, # Specific row (0-indexed) that contains the headers; accounts for the rows you skip
+            "skipRows": 3, # Number of rows to skip
+            # Set to a folder of raw lab EDDs to read those (see PFAS_Ingest) instead of the workbook's sheet
+            "eddDir": None,
+            "profiles": ingest.labProfiles,
+        },
+        "addresses": {
+            "layer": location + "/" + gdb + "/PFAS_Addresses",
+            "where": "\"Site\" = '" + site + "'",
+        },
+        "filter": {
+            # Same as samplesDQ in PFAS_ARFF_Tall
+            "site": site,
+            "prePost": ["PRE", "Unknown"],
+            "analyteGroup": "PFAS",
+            # SPECIFIC TO GRAYLING, we don't want results for the monitoring wells, which all start with "GAAF"
+            "excludeAddressPrefixes": ["GAAF"],
+        },
+        "standardize": {
+            "method": {
+                "533": "E533", # EPA method 533 (not defined in EDD valid values reference manual)
+                "EPA-537": "E537", # EPA method 537 (does NOT include modified method)
+                "EPA-537M": "E537M", # EPA method 537 modified (not defined in EDD valid values reference manual)
+                "537.1": "E537.1",
+                "EPA-537.1": "E537.1",
+            },
+            # Result units are converted to ng/l (water) or ng/g (solids) with the registry in PFAS_Units; unknown units stop the run
+            "units": unitRegistry,
+            "matrix": {
+                "Drinking Water": "WP",
+                "DW": "WP",
+                "PW": "WP",
+                "WP": "WP",
+                "Water": "W",
+            },
+            # Aqueous; unsure what this means, but if it's paired with a drinking water method, just call it WP
+            "aqueousMatrix": "Aqueous",
+            "aqueousMethods": ["E533", "E537", "E537.1"],
+        },
+        "join": {},
+        "pivot": {
+            "index": pivotIndex,
+        },
+        "nde": {
+            # The table's contents (not just its path) go in the config, so editing the table reruns the nde stage
+            "standards": load_standards(standardsPath).to_dict("records"),
+        },
+        "write_tall": {
+            "gdb": location + "/" + gdb,
+            "name": name.replace("-","_") + "_AllResultsFlatFile_XYEvent_FC",
+            "keys": outputDiff.tallKeys,
+            "manifest": location + "/PFAS_Manifests/" + name.replace("-","_") + "_AllResultsFlatFile_XYEvent_FC",
+        },
+        "write_wide": {
+            "gdb": location + "/" + gdb,
+            "name": site_ + "_Pivoted_FC",
+            "keys": outputDiff.wideKeys,
+            "manifest": location + "/PFAS_Manifests/" + site_ + "_Pivoted_FC",
+        },
+        "estimate": {
+            "analytes": ["PFOA", "PFOS"],
+            "statistic": "latest", # Each sampled address's "latest" or "max" result
+            "power": 2,
+            "neighbors": 8,
+            "maxDistance": 2000, # Meters
+            "gridSpacing": None, # None estimates at unsampled addresses; a number of meters estimates on a grid instead
+        },
+        "write_estimates": {
+            "gdb": location + "/" + gdb,
+            "name": site_ + "_Estimates_FC",
+            "keys": ["Estimate_ID"],
+            "manifest": location + "/PFAS_Manifests/" + site_ + "_Estimates_FC",
+        },
+        "filter_pairs": {
+            "maxPairDays": 365, # Only pair a POST sample with a PRE sample taken at most this many days before it
+            "maintenanceDays": 365, # Flag an address for filter maintenance if its last POST sample is older than this many days
+            "asOf": pd.Timestamp.now().strftime("%Y-%m-%d"), # So Days_Since_POST is worked out again each day
+        },
+        "write_filter_pairs": {
+            "gdb": location + "/" + gdb,
+            "name": site_ + "_FilterPairs_FC",
+            "keys": ["POST_Sample_ID"],
+            "manifest": location + "/PFAS_Manifests/" + site_ + "_FilterPairs_FC",
+        },
+    }
+    for stageName, settings in (overrides or {}).items():
+        config[stageName] = dict(config.get(stageName, {}), **settings)
+
+    # The filter pairing's samples go through the same filter (but keeping PRE and POST samples), standardization and join as the rest
+    config["filter_prepost"] = dict(config["filter"], prePost = ["PRE", "POST"])
+    config["standardize_prepost"] = config["standardize"]
+    config["join_prepost"] = config["join"]
+    return config
+
+
+stageConfig = site_stage_config(location, name, gdb, site, site_)
+
+
+# -------------------HASHING-------------------
+
+def hash_text(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def output_hash(value):
+    # Content hash of a stage output; dataframes are hashed on their values, columns and dtypes
+    if isinstance(value, pd.DataFrame):
+        h = hashlib.sha256()
+        h.update(json.dumps([list(map(str, value.columns)), list(map(str, value.dtypes))]).encode("utf-8"))
+        h.update(pd.util.hash_pandas_object(value, index = True).values.tobytes())
+        return h.hexdigest()
+    return hash_text(json.dumps(value, sort_keys = True, default = str))
+
+
+def file_fingerprint(path):
+    # Cheap stand-in for hashing a whole workbook: if the path, size and modified time are the same, the file is treated as unchanged
+    stat = os.stat(path)
+    return {"path": os.path.abspath(path), "size": stat.st_size, "mtime": stat.st_mtime}
+
+
+# -------------------STAGES-------------------
+
+# Each stage function takes a dictionary of its dependencies' outputs and its config, and returns its output.
+
+def read_stage(inputs, config):
+    # Read in the "all results flat file" table of the site summary workbook, getting rid of no-data rows at top of sheet, or the folder of EDDs
+    if config.get("eddDir"):
+        df, log = ingest.ingest(config["eddDir"], config["profiles"])
+        print("Read", len(log), "EDD files,", len(df), "rows")
+        return df
+    return pd.read_excel(config["path"], sheet_name = config["sheet"], header = config["headerRow"], skiprows = config["skipRows"])
+
+
+def read_fingerprint(config):
+    if config.get("eddDir"):
+        return [file_fingerprint(path) for path in ingest.edd_files(config["eddDir"])]
+    return file_fingerprint(config["path"])
+
+
+def addresses_stage(inputs, config):
+    # Read the site's geocoded addresses from the master PFAS address layer
+    import arcpy # Only available in ArcGIS Pro's Python environment
+    fields = ["Address", "displayx", "displayy", "AddressID"]
+    with arcpy.da.SearchCursor(config["layer"], fields, where_clause = config["where"]) as cursor:
+        return pd.DataFrame.from_records(data = cursor, columns = fields)
+
+
+def filter_stage(inputs, config):
+    df = inputs["read"].copy()
+
+    # Input the "main" site name and capitalize the address values, as in PFAS_ARFF_Tall
+    df["Site"] = config["site"]
+    df["Sampled_Address_Clean"] = df["Sampled_Address_Clean"].astype("string").str.upper()
+
+    keep = df["Sample_PrePost"].isin(config["prePost"]) & (df["Analyte_Group"] == config["analyteGroup"])
+    for prefix in config["excludeAddressPrefixes"]:
+        keep &= ~df["Sampled_Address_Clean"].str.startswith(prefix, na = False)
+
+    return df[keep].reset_index(drop = True)
+
+
+def standardize_stage(inputs, config):
+    df = inputs["filter"].copy()
+
+    # Bring the messy values into the standardized value fields, then replace the ones we have standard values for
+    df["Analysis_Method_Stdz"] = df["Analysis_Method"].replace(config["method"])
+    df["Matrix_Stdz"] = df["Matrix"].replace(config["matrix"])
+
+    # Convert Result_Num, RDL and LOQ to standard units; this also fills in Result_Unit_Stdz
+    df = convert_units(df, config["units"])
+
+    aqueous = (df["Matrix"] == config["aqueousMatrix"]) & df["Analysis_Method_Stdz"].isin(config["aqueousMethods"])
+    df.loc[aqueous, "Matrix_Stdz"] = "WP"
+
+    # Print the unique values for the Stdz fields
+    print("Method values: ", set(df["Analysis_Method_Stdz"].unique()))
+    print("Unit values: ", set(df["Result_Unit_Stdz"].unique()))
+    print("Matrix values: ", set(df["Matrix_Stdz"].unique()))
+
+    return df
+
+
+def join_stage(inputs, config):
+    addresses = inputs["addresses"].drop_duplicates("Address")
+    df = inputs["standardize"].merge(addresses, how = "left", left_on = "Sampled_Address_Clean", right_on = "Address").drop(columns = "Address")
+
+    # Samples that didn't get an address ID; none is good here!
+    missing = df.loc[df["AddressID"].isna(), "Sampled_Address_Clean"].unique()
+    if len(missing):
+        print("Addresses without an AddressID:", list(missing))
+
+    return df
+
+
+def pivot_stage(inputs, config):
+    df = inputs["join"]
+    wide = df.pivot(index = config["index"], columns = "Analyte_Abbrev", values = ["Result_Num", "Result_Qualifier"])
+
+    # Flatten the column names the same way the Excel clean-up in PFAS_ARFF_Wide does (e.g. "PFOS_Result_Num")
+    wide.columns = [analyte_field_name(analyte) + "_" + value for value, analyte in wide.columns]
+    wide.reset_index(inplace = True)
+
+    # Pull the coordinates back in for the XY feature class
+    coords = df[["AddressID", "displayx", "displayy"]].drop_duplicates("AddressID")
+    return wide.merge(coords, how = "left", on = "AddressID")
+
+
+def nde_stage(inputs, config):
+    # Classify each sample against the standards in force on its Collect_Date
+    wide = inputs["pivot"].copy()
+    standards = pd.DataFrame(config["standards"])
+    ndes = wide_nde(wide, standards)
+    for field in ndes.columns:
+        wide[field] = ndes[field]
+    return wide
+
+
+def estimate_stage(inputs, config):
+    # IDW estimates of the analytes at the site's addresses that haven't been sampled (or on a grid)
+    samples = estimation.sampled_values(inputs["join"], config["analytes"], config["statistic"])
+    return estimation.estimate(samples, inputs["addresses"], config["analytes"], config["gridSpacing"], config["neighbors"], config["power"],
+        config["maxDistance"])
+
+
+def standardize_prepost_stage(inputs, config):
+    return standardize_stage({"filter": inputs["filter_prepost"]}, config)
+
+
+def join_prepost_stage(inputs, config):
+    return join_stage({"standardize": inputs["standardize_prepost"], "addresses": inputs["addresses"]}, config)
+
+
+def filter_pairs_stage(inputs, config):
+    # Pair each POST sample with its PRE sample and summarize the filter's performance per address (see PFAS_FilterPairing)
+    df = inputs["join_prepost"]
+    pairs = filterPairing.pair_samples(df, config["maxPairDays"])
+    efficiency = filterPairing.treatment_efficiency(df, pairs)
+    return filterPairing.address_summary(df, pairs, efficiency, config["maintenanceDays"], config["asOf"])
+
+
+def feature_rows(df, fields):
+    # Rows for an insert/update cursor on ["SHAPE@XY"] + fields: the XY point (None without coordinates), then the field values with nulls as None
+    values = df[fields].astype(object).where(df[fields].notna(), None)
+    for xy, row in zip(zip(df["displayx"], df["displayy"]), values.itertuples(index = False, name = None)):
+        yield [xy if pd.notna(xy[0]) and pd.notna(xy[1]) else None] + list(row)
+
+
+def create_feature_class(df, gdbPath, fcName, fields):
+    # Create an empty point feature class (WGS 1984) with a field for each dataframe column, replacing any existing one
+    import arcpy # Only available in ArcGIS Pro's Python environment
+
+    out = gdbPath + "/" + fcName
+    if arcpy.Exists(out):
+        arcpy.management.Delete(out)
+    arcpy.management.CreateFeatureclass(gdbPath, fcName, "POINT", spatial_reference = arcpy.SpatialReference(4326))
+
+    for field in fields:
+        if pd.api.types.is_datetime64_any_dtype(df[field]):
+            arcpy.management.AddField(out, field, "DATE")
+        elif pd.api.types.is_numeric_dtype(df[field]):
+            arcpy.management.AddField(out, field, "DOUBLE")
+        else:
+            arcpy.management.AddField(out, field, "TEXT", field_length = 255)
+    return out
+
+
+def apply_changes(out, df, keyFields, fields, changes):
+    # Apply only the inserts/updates/deletes from PFAS_OutputDiff to an existing feature class.
+    # The manifest is only saved once everything has been applied, so after a run that failed partway the same inserts come round again. Inserts
+    # whose key is already in the feature class are updated in place instead, and any extra rows with the same key are deleted, so re-running
+    # never leaves duplicate keys behind.
+    import arcpy # Only available in ArcGIS Pro's Python environment
+
+    keys = outputDiff.row_keys(df, keyFields)
+    position = pd.Series(range(len(df)), index = keys)
+    inserts = set(changes["inserts"])
+    updates = set(changes["updates"])
+    deletes = set(changes["deletes"])
+    cursorFields = ["SHAPE@XY"] + fields
+    keyIndexes = [cursorFields.index(k) for k in keyFields]
+
+    # With only a few changed rows, only ask the cursor for rows with those sample IDs rather than reading the whole feature class
+    where = None
+    touched = inserts | updates | deletes
+    if touched and len(touched) <= 1000:
+        ids = sorted(set(key.split(outputDiff.keySeparator)[0] for key in touched))
+        where = keyFields[0] + " In (" + ", ".join("'" + i.replace("'", "''") + "'" for i in ids) + ")"
+
+    written = set()
+    if touched:
+        writeRows = df.iloc[position[list(inserts | updates)].to_numpy()] if inserts | updates else df.iloc[[]]
+        newValues = dict(zip(outputDiff.row_keys(writeRows, keyFields), feature_rows(writeRows, fields)))
+        with arcpy.da.UpdateCursor(out, cursorFields, where_clause = where) as cursor:
+            for row in cursor:
+                key = outputDiff.keySeparator.join("" if row[i] is None else str(row[i]) for i in keyIndexes)
+                if key in deletes or key in written:
+                    cursor.deleteRow()
+                elif key in newValues:
+                    cursor.updateRow(newValues[key])
+                    written.add(key)
+
+    inserts -= written
+    if inserts:
+        insertRows = df.iloc[position[list(inserts)].to_numpy()]
+        with arcpy.da.InsertCursor(out, cursorFields) as cursor:
+            for row in feature_rows(insertRows, fields):
+                cursor.insertRow(row)
+
+
+def write_feature_class(df, gdbPath, fcName, keyFields, manifestPath):
+    # Write a dataframe with displayx/displayy to a point feature class (WGS 1984). If the feature class was written before with the same
+    # fields, only the rows that changed since then are inserted/updated/deleted (see PFAS_OutputDiff); otherwise it's rewritten.
+    import arcpy # Only available in ArcGIS Pro's Python environment
+
+    out = gdbPath + "/" + fcName
+    fields = [c for c in df.columns if c not in ("displayx", "displayy")]
+    newHashes = outputDiff.row_hashes(df, keyFields)
+    oldHashes, oldFields = outputDiff.load_manifest(manifestPath)
+
+    if oldHashes is not None and oldFields == list(df.columns) and arcpy.Exists(out):
+        changes = outputDiff.diff(newHashes, oldHashes)
+        apply_changes(out, df, keyFields, fields, changes)
+    else:
+        create_feature_class(df, gdbPath, fcName, fields)
+        with arcpy.da.InsertCursor(out, ["SHAPE@XY"] + fields) as cursor:
+            for row in feature_rows(df, fields):
+                cursor.insertRow(row)
+        changes = {"inserts": newHashes["Key"].to_numpy(), "updates": [], "deletes": []}
+
+    outputDiff.save_manifest(manifestPath, newHashes, df.columns)
+    print(fcName + ":", outputDiff.describe(changes))
+    return {"path": out, "rows": len(df), "manifest": manifestPath, "changes": {kind: len(keys) for kind, keys in changes.items()}}
+
+
+def write_tall_stage(inputs, config):
+    return write_feature_class(inputs["join"], config["gdb"], config["name"], config["keys"], config["manifest"])
+
+
+def write_wide_stage(inputs, config):
+    return write_feature_class(inputs["nde"], config["gdb"], config["name"], config["keys"], config["manifest"])
+
+
+def write_estimates_stage(inputs, config):
+    return write_feature_class(inputs["estimate"], config["gdb"], config["name"], config["keys"], config["manifest"])
+
+
+def write_filter_pairs_stage(inputs, config):
+    return write_feature_class(inputs["filter_pairs"], config["gdb"], config["name"], config["keys"], config["manifest"])
+
+
+def feature_class_exists(output):
+    import arcpy # Only available in ArcGIS Pro's Python environment
+    return arcpy.Exists(output["path"])
+
+
+def build_stages():
+    # The DAG: each stage has its function, the stages it depends on, its config, and (for file sources) a fingerprint of the file it reads.
+    # Stages with "always" set read a live source we can't cheaply fingerprint; they run every time, but if their output hasn't changed
+    # the stages after them are still served from the cache. Sinks write outside the cache, so they're only skipped if they were the last thing
+    # written to their output (an older cached write of the same output may since have been overwritten) and the output still exists.
+    return {
+        "read": {"run": read_stage, "deps": [], "fingerprint": read_fingerprint},
+        "addresses": {"run": addresses_stage, "deps": [], "always": True},
+        "filter": {"run": filter_stage, "deps": ["read"]},
+        "standardize": {"run": standardize_stage, "deps": ["filter"]},
+        "join": {"run": join_stage, "deps": ["standardize", "addresses"]},
+        "pivot": {"run": pivot_stage, "deps": ["join"]},
+        "nde": {"run": nde_stage, "deps": ["pivot"]},
+        "write_tall": {"run": write_tall_stage, "deps": ["join"], "sink": True, "exists": feature_class_exists},
+        "write_wide": {"run": write_wide_stage, "deps": ["nde"], "sink": True, "exists": feature_class_exists},
+        "estimate": {"run": estimate_stage, "deps": ["join", "addresses"]},
+        "write_estimates": {"run": write_estimates_stage, "deps": ["estimate"], "sink": True, "exists": feature_class_exists},
+        "filter_prepost": {"run": filter_stage, "deps": ["read"]},
+        "standardize_prepost": {"run": standardize_prepost_stage, "deps": ["filter_prepost"]},
+        "join_prepost": {"run": join_prepost_stage, "deps": ["standardize_prepost", "addresses"]},
+        "filter_pairs": {"run": filter_pairs_stage, "deps": ["join_prepost"]},
+        "write_filter_pairs": {"run": write_filter_pairs_stage, "deps": ["filter_pairs"], "sink": True, "exists": feature_class_exists},
+    }
+
+
+# -------------------RUNNER-------------------
+
+def stage_order(stages, targets = None):
+    # Depth-first topological order of the stages needed for the targets (all stages if no targets)
+    order = []
+    seen = set()
+
+    def visit(stageName, path):
+        if stageName in path:
+            raise ValueError("Stage cycle: " + " -> ".join(path + [stageName]))
+        if stageName in seen:
+            return
+        for dep in stages[stageName]["deps"]:
+            visit(dep, path + [stageName])
+        seen.add(stageName)
+        order.append(stageName)
+
+    for stageName in (targets or list(stages)):
+        visit(stageName, [])
+    return order
+
+
+def stage_key(stageName, stage, config, depHashes):
+    # Cache key = hash of the stage name, its config, its dependencies' output hashes and (for file sources) the file fingerprint
+    keyParts = {"stage": stageName, "config": config, "inputs": depHashes}
+    if "fingerprint" in stage:
+        keyParts["fingerprint"] = stage["fingerprint"](config)
+    return hash_text(json.dumps(keyParts, sort_keys = True, default = str))
+
+
+def load_manifest(cacheDir):
+    path = cacheDir + "/manifest.json"
+    if os.path.exists(path):
+        with open(path) as f:
+            return json.load(f)
+    return {}
+
+
+def save_manifest(cacheDir, manifest):
+    # Write to a temporary file first so an interrupted run can't leave a half-written manifest
+    path = cacheDir + "/manifest.json"
+    with open(path + ".tmp", "w") as f:
+        json.dump(manifest, f, indent = 1)
+    os.replace(path + ".tmp", path)
+
+
+def last_write(manifest, path):
+    # Key of the sink output in the manifest that most recently wrote to path, or None
+    writes = [(entry["created"], key) for key, entry in manifest.items() if entry.get("output") and entry["output"].get("path") == path]
+    return max(writes)[1] if writes else None
+
+
+def prune_stage(cacheDir, manifest, stageName, keep = keepPerStage):
+    # Delete all but the "keep" most recently used cached outputs of a stage, from the folder and the manifest
+    entries = sorted((k for k, e in manifest.items() if e["stage"] == stageName), key = lambda k: manifest[k].get("used", manifest[k]["created"]), reverse = True)
+    for key in entries[keep:]:
+        path = cacheDir + "/" + key + ".pkl"
+        if os.path.exists(path):
+            os.remove(path)
+        del manifest[key]
+
+
+def run_pipeline(stages, stageConfig, cacheDir, targets = None, dryRun = False, memory = None):
+    # Run (or with dryRun, just plan) the stages needed for the targets. Returns a dictionary of stage name: (status, seconds).
+    # memory is an optional dictionary-like cache of stage key: output (see PFAS_Worker) checked before unpickling from the cache folder.
+    # Status is "cached" (output reused), "run" (executed), "unchanged" (an "always" stage that re-ran but gave the same output as last time),
+    # or in a dry run "will run".
+    os.makedirs(cacheDir, exist_ok = True)
+    manifest = load_manifest(cacheDir)
+
+    outputs = {} # Stage name: output, only for outputs we've actually needed to load or compute
+    hashes = {} # Stage name: output hash; None in a dry run when the output can't be known until the stage runs
+    keys = {}
+    report = {}
+
+    def get_output(stageName):
+        if stageName not in outputs:
+            key = keys[stageName]
+            if memory is not None and key in memory:
+                outputs[stageName] = memory[key]
+            else:
+                outputs[stageName] = pd.read_pickle(cacheDir + "/" + key + ".pkl")
+                if memory is not None:
+                    memory[key] = outputs[stageName]
+        return outputs[stageName]
+
+    for stageName in stage_order(stages, targets):
+        stage = stages[stageName]
+        config = stageConfig.get(stageName, {})
+        depHashes = [hashes[dep] for dep in stage["deps"]]
+
+        if dryRun and None in depHashes:
+            report[stageName] = ("will run", 0.0)
+            hashes[stageName] = None
+            continue
+
+        key = stage_key(stageName, stage, config, depHashes)
+        keys[stageName] = key
+        entry = manifest.get(key)
+        cached = entry is not None and os.path.exists(cacheDir + "/" + key + ".pkl") and not stage.get("always")
+        if cached and stage.get("sink"):
+            cached = last_write(manifest, entry["output"]["path"]) == key
+        if cached and "exists" in stage:
+            cached = stage["exists"](entry["output"])
+
+        if cached:
+            hashes[stageName] = entry["hash"]
+            report[stageName] = ("cached", 0.0)
+            if not dryRun:
+                entry["used"] = time.time()
+            continue
+
+        if dryRun:
+            # A live source re-reads every run; plan the rest assuming it comes back the same as last time
+            report[stageName] = ("will run", 0.0)
+            hashes[stageName] = entry["hash"] if entry is not None and stage.get("always") else None
+            continue
+
+        start = time.perf_counter()
+        output = stage["run"]({dep: get_output(dep) for dep in stage["deps"]}, config)
+        seconds = time.perf_counter() - start
+
+        outputs[stageName] = output
+        hashes[stageName] = output_hash(output)
+        status = "unchanged" if entry is not None and entry["hash"] == hashes[stageName] else "run"
+
+        pd.to_pickle(output, cacheDir + "/" + key + ".pkl")
+        if memory is not None:
+            memory[key] = output
+        manifest[key] = {"stage": stageName, "hash": hashes[stageName], "created": time.time(), "used": time.time(),
+            "output": output if stage.get("sink") else None}
+        prune_stage(cacheDir, manifest, stageName)
+        save_manifest(cacheDir, manifest)
+
+        report[stageName] = (status, seconds)
+
+    if not dryRun:
+        save_manifest(cacheDir, manifest) # Records when the cached outputs were last used
+    return report
+
+
+def print_report(report, dryRun = False):
+    print("Dry run; nothing was executed" if dryRun else "Pipeline finished")
+    for stageName, (status, seconds) in report.items():
+        print("  {:<20} {:<10} {:.2f} s".format(stageName, status, seconds))
+
+
+# Run the pipeline (only when this is run as a script, so the stages can be imported by other scripts)
+
+if __name__ == "__main__":
+    if "--dry-run" in sys.argv:
+        dryRun = True
+
+    stages = build_stages()
+    report = run_pipeline(stages, stageConfig, cacheDir, dryRun = dryRun)
+    print_report(report, dryRun)
@@ -0,0 +1,257 @@
+# This script is used for making a results summary for every sampled address, to send to residents: each sample's per-analyte results,
+# their NDE status against the standards (e.g. MCLs), and the address's Address_NDE and Current_AltWaterRec.
+
+# The pivoted ("wide") table is sorted by AddressID once and cut into batches of whole addresses (batchSize addresses each). Each batch goes to a
+# worker process (ProcessPoolExecutor), which writes one file per address per format:
+#   html    a page for printing or emailing (htmlTemplate below)
+#   txt     the same as plain text
+#   csv     the address's rows of the wide table, for anyone who wants the numbers
+# A manifest (<site>_ResidentSummaries_Manifest.csv) lists every file written, and a batch log gives the time each batch took.
+# Run this as a standalone script (e.g. with ArcGIS Pro's propy.bat), not from the Python window in Pro, since the worker processes need to be
+# able to import this file.
+
+# Last updated 10/18/2026
+
+import html
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor # Used for writing the batches in parallel
+from string import Template
+
+import numpy as np
+import pandas as pd # Used for grouping the results
+
+from PFAS_Standards import analyte_field_name, load_standards
+
+# Things to definitely change per site and user
+
+# Geodatabase location and name, and the wide and tall feature classes
+location = r"C:\Users\JohnsonN35\Local_Work\PFAS_Script"
+gdb = "PFAS.gdb"
+site_ = "Grayling_GAAF"
+wideFC = site_ + "_Pivoted_FC"
+samplesFC = "Grayling_GAAF_SiteSummary_Copy_AllResultsFlatFile_XYEvent_FC"
+
+# Where the summaries go (one folder per format)
+outDir = location + "/" + site_ + "_ResidentSummaries"
+
+# Formats to write: any of "html", "txt", "csv"
+formats = ["html", "txt"]
+
+# Addresses per batch, and number of processes (None uses every core)
+batchSize = 200
+workers = None
+
+# Site name and contact line printed on each summary
+siteTitle = "Grayling GAAF"
+contact = "Questions about your results? Contact your local health department."
+
+ndeText = {"ND": "Not detected", "D": "Detected, below the standard", "E": "Above the standard", "NS": "Detected, no standard in force on that date",
+    None: ""}
+
+htmlTemplate = Template("""<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>PFAS results for $address</title>
+<style>
+body { font-family: Arial, sans-serif; margin: 2em; }
+table { border-collapse: collapse; margin-bottom: 1.5em; }
+th, td { border: 1px solid #999; padding: 4px 8px; text-align: left; }
+.E { background: #f8d0d0; font-weight: bold; }
+</style>
+</head>
+<body>
+<h1>PFAS drinking water results</h1>
+<p><b>Address:</b> $address<br><b>Site:</b> $site<br><b>Address status:</b> $addressNDE<br><b>Current alternate water recommendation:</b> $altWater</p>
+$samples
+<p>$contact</p>
+<p><small>Prepared $prepared. Results are in ng/l (parts per trillion).</small></p>
+</body>
+</html>
+""")
+
+textTemplate = Template("""PFAS drinking water results
+
+Address: $address
+Site: $site
+Address status: $addressNDE
+Current alternate water recommendation: $altWater
+
+$samples
+$contact
+
+Prepared $prepared. Results are in ng/l (parts per trillion).
+""")
+
+
+def result_fields(wide, analytes):
+    # (analyte label, Result_Num field, NDE field or None) for every analyte in the wide table. The label is the analyte's abbreviation
+    # (e.g. "HFPO-DA (GenX)", "6:2 FTS"), found by matching analyte_field_name() of each of the analytes (the tall Analyte_Abbrev values and the
+    # standards table's) to the field names; a field with no matching abbreviation keeps its field name.
+    labels = {analyte_field_name(a): a for a in analytes if isinstance(a, str) and a}
+    fields = []
+    for field in wide.columns:
+        if field.endswith("_Result_Num"):
+            prefix = field[:-len("_Result_Num")]
+            nde = prefix + "_NDE"
+            fields.append((labels.get(prefix, prefix), field, nde if nde in wide.columns else None))
+    return fields
+
+
+def standard_first(fields, standards):
+    # Analytes with a standard first (in the standards table's order), then the rest in field order
+    withStandard = [analyte_field_name(a) + "_Result_Num" for a in standards["Analyte_Abbrev"].unique()]
+    rank = {field: i for i, field in enumerate(withStandard)}
+    return sorted(fields, key = lambda f: rank.get(f[1], len(rank)))
+
+
+def file_stem(addressID):
+    # A file name that's safe on Windows for an AddressID
+    return re.sub(r"[^A-Za-z0-9_.-]", "_", str(addressID))
+
+
+def format_result(value):
+    if value is None or value != value:
+        return "Not tested"
+    if value == 0:
+        return "ND"
+    return "{:g}".format(value)
+
+
+def sample_rows(rows, fields):
+    # For each sample (newest first): its heading and a (analyte, result, status) row per analyte that was tested
+    samples = []
+    for row in rows.sort_values("Collect_Date", ascending = False).to_dict("records"):
+        date = pd.Timestamp(row["Collect_Date"]).strftime("%m/%d/%Y") if pd.notna(row["Collect_Date"]) else "unknown date"
+        heading = "Sample collected " + date + (" (" + str(row["Sampling_Round"]) + ")" if pd.notna(row.get("Sampling_Round")) else "")
+        results = []
+        for label, resultField, ndeField in fields:
+            value = row[resultField]
+            if pd.isna(value):
+                continue
+            nde = row[ndeField] if ndeField and pd.notna(row[ndeField]) else None
+            results.append((label, format_result(value), nde))
+        samples.append((heading, results))
+    return samples
+
+
+def render_html(info, samples):
+    blocks = []
+    for heading, results in samples:
+        lines = ["<h2>" + html.escape(heading) + "</h2>", "<table>", "<tr><th>Analyte</th><th>Result</th><th>Status</th></tr>"]
+        for label, result, nde in results:
+            lines.append('<tr class="' + (nde or "") + '"><td>' + html.escape(label) + "</td><td>" + html.escape(result) + "</td><td>"
+                + html.escape(ndeText[nde]) + "</td></tr>")
+        lines.append("</table>")
+        blocks.append("\n".join(lines))
+    return htmlTemplate.substitute({k: html.escape(v) for k, v in info.items()}, samples = "\n".join(blocks))
+
+
+def render_text(info, samples):
+    blocks = []
+    for heading, results in samples:
+        lines = [heading, "-" * len(heading)]
+        for label, result, nde in results:
+            lines.append("{:<20} {:>12}  {}".format(label, result, ndeText[nde]))
+        blocks.append("\n".join(lines) + "\n")
+    return textTemplate.substitute(info, samples = "\n".join(blocks))
+
+
+def address_info(rows, prepared):
+    first = rows.iloc[0]
+
+    def text(field):
+        return str(first[field]) if field in rows.columns and pd.notna(first[field]) else "Not available"
+
+    return {"address": text("Sampled_Address_Clean"), "site": siteTitle, "addressNDE": ndeText.get(text("Address_NDE"), text("Address_NDE")),
+        "altWater": text("Current_AltWaterRec"), "contact": contact, "prepared": prepared}
+
+
+def write_batch(batchNumber, batch, fields, formats, outDir, prepared):
+    # Write the summaries for one batch of whole addresses. Returns the manifest rows and the batch's timing.
+    start = time.perf_counter()
+    manifest = []
+    bounds = np.flatnonzero(batch["AddressID"].to_numpy()[1:] != batch["AddressID"].to_numpy()[:-1]) + 1
+    for first, last in zip(np.r_[0, bounds], np.r_[bounds, len(batch)]):
+        rows = batch.iloc[first:last]
+        addressID = rows["AddressID"].iloc[0]
+        info = address_info(rows, prepared)
+        samples = sample_rows(rows, fields)
+        anyE = any(nde == "E" for _, results in samples for _, _, nde in results)
+
+        for fmt in formats:
+            path = os.path.join(outDir, fmt, file_stem(addressID) + "." + fmt)
+            if fmt == "html":
+                with open(path, "w", encoding = "utf-8") as f:
+                    f.write(render_html(info, samples))
+            elif fmt == "txt":
+                with open(path, "w", encoding = "utf-8") as f:
+                    f.write(render_text(info, samples))
+            else:
+                rows.to_csv(path, index = False, date_format = "%Y-%m-%d")
+            manifest.append({"AddressID": addressID, "Sampled_Address_Clean": info["address"], "Samples": len(rows), "Any_E": anyE,
+                "Format": fmt, "Path": path, "Batch": batchNumber})
+
+    timing = {"Batch": batchNumber, "Addresses": len(bounds) + 1 if len(batch) else 0, "Files": len(manifest),
+        "Seconds": time.perf_counter() - start, "Process": os.getpid()}
+    return manifest, timing
+
+
+def address_batches(wide, batchSize = batchSize):
+    # Sort by AddressID once and cut into slices of batchSize whole addresses
+    wide = wide[wide["AddressID"].notna()].sort_values(["AddressID", "Collect_Date"], kind = "mergesort").reset_index(drop = True)
+    starts = np.r_[0, np.flatnonzero(wide["AddressID"].to_numpy()[1:] != wide["AddressID"].to_numpy()[:-1]) + 1]
+    cuts = list(starts[::batchSize]) + [len(wide)]
+    return [wide.iloc[cuts[i]:cuts[i + 1]] for i in range(len(cuts) - 1) if cuts[i] < cuts[i + 1]]
+
+
+def generate(wide, standards, analytes = (), outDir = outDir, formats = formats, batchSize = batchSize, workers = workers):
+    # Write every address's summaries; analytes are the tall Analyte_Abbrev values, used for the labels along with the standards table's.
+    # Returns the manifest and batch log dataframes (also saved in outDir).
+    fields = standard_first(result_fields(wide, list(standards["Analyte_Abbrev"].unique()) + list(analytes)), standards)
+    prepared = pd.Timestamp.now().strftime("%m/%d/%Y")
+    for fmt in formats:
+        os.makedirs(os.path.join(outDir, fmt), exist_ok = True)
+
+    manifest = []
+    log = []
+    with ProcessPoolExecutor(max_workers = workers) as pool:
+        futures = [pool.submit(write_batch, i, batch, fields, formats, outDir, prepared) for i, batch in enumerate(address_batches(wide, batchSize))]
+        for future in futures:
+            rows, timing = future.result()
+            manifest.extend(rows)
+            log.append(timing)
+
+    manifest = pd.DataFrame(manifest, columns = ["AddressID", "Sampled_Address_Clean", "Samples", "Any_E", "Format", "Path", "Batch"])
+    log = pd.DataFrame(log, columns = ["Batch", "Addresses", "Files", "Seconds", "Process"])
+    manifest.to_csv(os.path.join(outDir, site_ + "_ResidentSummaries_Manifest.csv"), index = False)
+    log.to_csv(os.path.join(outDir, site_ + "_ResidentSummaries_Batches.csv"), index = False)
+    return manifest, log
+
+
+# Write the site's summaries (only when this is run as a script, so the functions above can be imported by other scripts, including the worker processes)
+
+if __name__ == "__main__":
+    import arcpy # Only available in ArcGIS Pro's Python environment
+
+    fields = [f.name for f in arcpy.ListFields(location + "/" + gdb + "/" + wideFC) if f.type not in ("OID", "Geometry")]
+    wide = pd.DataFrame.from_records(data = arcpy.da.SearchCursor(location + "/" + gdb + "/" + wideFC, fields), columns = fields)
+
+    # Address_NDE and Current_AltWaterRec are only in the tall table. Use each address's latest values (by Collect_Date; groupby's last() skips
+    # blanks), since that's the current recommendation. The tall Analyte_Abbrev values are the labels printed for each analyte.
+    tallFields = ["AddressID", "Collect_Date", "Address_NDE", "Current_AltWaterRec", "Analyte_Abbrev"]
+    tall = pd.DataFrame.from_records(data = arcpy.da.SearchCursor(location + "/" + gdb + "/" + samplesFC, tallFields), columns = tallFields)
+    addressFields = tall.dropna(subset = ["AddressID"]).sort_values("Collect_Date", kind = "mergesort").groupby("AddressID")[
+        ["Address_NDE", "Current_AltWaterRec"]].last().reset_index()
+    wide = wide.merge(addressFields, on = "AddressID", how = "left")
+
+    start = time.perf_counter()
+    manifest, log = generate(wide, load_standards(), tall["Analyte_Abbrev"].dropna().unique())
+    seconds = time.perf_counter() - start
+
+    print(log.to_string(index = False))
+    print("{:,} files for {:,} addresses in {} batches, {:.1f} s".format(len(manifest), manifest["AddressID"].nunique(), len(log), seconds))
+    print(int(manifest.drop_duplicates("AddressID")["Any_E"].sum()), "addresses with a result above a standard")
+    print("Wrote", outDir)
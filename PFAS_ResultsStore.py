@@ -0,0 +1,200 @@
+# This script is used for keeping a statewide "tall" PFAS results store: every site's tall results in one set of Parquet files,
+# partitioned by Site and sampling year (Site=<site>/Year=<year>/...). See "PFAS_ARFF_Tall" for how a site's tall feature class is made.
+
+# Statewide questions (e.g. all PFOS exceedances across all sites in 2022) used to need manual merges of each site's gdb table, which stop
+# fitting in memory as the archive grows. Queries against the store only read the partitions that match the filter (partition pruning) and
+# only the columns asked for (column projection), and the aggregations work through the store one record batch at a time, so memory stays
+# bounded no matter how much history is in it.
+
+# Loading a site replaces everything the store had for that site, so re-running a site after fixing its data is safe. The new results are
+# written beside the old ones and swapped in once they're complete, so a load that fails partway leaves the site as it was.
+
+# Last updated 10/18/2026
+
+import os
+import shutil
+from urllib.parse import quote
+
+import pandas as pd
+import pyarrow as pa # Used for the typed Parquet store
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+
+# Things to definitely change per user
+
+# Where the statewide store lives; it's a folder, not a file
+storeDir = r"C:\Users\JohnsonN35\Local_Work\PFAS_Script\PFAS_Statewide_Results"
+
+# Geodatabase location and name, and the tall feature class to load into the store
+location = r"C:\Users\JohnsonN35\Local_Work\PFAS_Script"
+gdb = "PFAS.gdb"
+samplesFC = "Grayling_GAAF_SiteSummary_Copy_AllResultsFlatFile_XYEvent_FC"
+
+# Aim for row groups of about this many rows; smaller row groups skip better, bigger ones compress better
+rowGroupRows = 128 * 1024
+
+# Schema of the tall feature class (see the AddFields call in PFAS_ARFF_Tall), plus the joined address fields.
+# TEXT -> string, DATE -> timestamp, DOUBLE -> float64.
+tallSchema = pa.schema([
+    ("Site", pa.string()),
+    ("Site_Name", pa.string()),
+    ("Site_Subarea", pa.string()),
+    ("Data_File_Name", pa.string()),
+    ("Report_File_Name", pa.string()),
+    ("Lab_Name", pa.string()),
+    ("Lab_Work_Order", pa.string()),
+    ("Lab_Sample_ID", pa.string()),
+    ("Field_Sample_ID", pa.string()),
+    ("Field_Location_Code", pa.string()),
+    ("Sampled_Address_Clean", pa.string()),
+    ("Sampling_Round", pa.string()),
+    ("Sample_PrePost", pa.string()),
+    ("Duplicate", pa.string()),
+    ("Collect_Date", pa.timestamp("ms")),
+    ("Collected_By", pa.string()),
+    ("Matrix", pa.string()),
+    ("Matrix_Stdz", pa.string()),
+    ("Analyte_Group", pa.string()),
+    ("Analysis_Method", pa.string()),
+    ("Analysis_Method_Stdz", pa.string()),
+    ("Analyte_Abbrev", pa.string()),
+    ("Result", pa.string()),
+    ("Result_Num", pa.float64()),
+    ("Result_Unit", pa.string()),
+    ("Result_Unit_Stdz", pa.string()),
+    ("Result_Qualifier", pa.string()),
+    ("Detect_Flag", pa.string()),
+    ("RDL", pa.float64()),
+    ("LOQ", pa.float64()),
+    ("Analyte_NDE", pa.string()),
+    ("Sample_NDE", pa.string()),
+    ("Sample_TotalPFAS", pa.float64()),
+    ("DEH_Comment", pa.string()),
+    ("Address_NDE", pa.string()),
+    ("Current_AltWaterRec", pa.string()),
+    ("AddressID", pa.string()),
+    ("displayx", pa.float64()),
+    ("displayy", pa.float64()),
+])
+
+# Partition fields; these are stored in the folder names, not in the files
+partitionSchema = pa.schema([("Site", pa.string()), ("Year", pa.int16())])
+partitioning = ds.partitioning(partitionSchema, flavor = "hive")
+
+# Schema of the store as a whole (the tall fields plus Year)
+storeSchema = tallSchema.append(pa.field("Year", pa.int16()))
+
+
+def to_store_table(df):
+    # Conform a tall dataframe to the store schema; missing fields come through as nulls, extra fields are dropped
+    df = df.copy()
+    for field in tallSchema:
+        if field.name not in df.columns:
+            df[field.name] = None
+        elif pa.types.is_string(field.type):
+            # Address IDs and the like sometimes come through as numbers; keep them as text like the feature class does
+            df[field.name] = df[field.name].astype("string")
+    df["Collect_Date"] = pd.to_datetime(df["Collect_Date"])
+    df["AddressID"] = df["AddressID"].astype("string").str.replace(r"\.0$", "", regex = True)
+    df["Year"] = df["Collect_Date"].dt.year.astype("Int16")
+    return pa.Table.from_pandas(df[storeSchema.names], schema = storeSchema, preserve_index = False)
+
+
+def load_site(df, storeDir):
+    # Replace a site's results in the store with the tall dataframe df (all rows must have the same Site)
+    sites = df["Site"].dropna().unique()
+    if len(sites) != 1:
+        raise ValueError("Expected results for exactly one site, got: " + ", ".join(map(str, sites)))
+
+    # Write the site into a staging folder first and only swap it in for what the store had once the write has worked, so a failed load
+    # leaves the site's old results in place. The whole site folder is swapped, so years that are no longer in the site's data don't hang
+    # around. The staging and replaced folders start with "_", which the store's readers skip.
+    siteName = quote(str(sites[0]), safe = "")
+    siteDir = os.path.join(storeDir, "Site=" + siteName)
+    stagingDir = os.path.join(storeDir, "_staging_" + siteName)
+    replacedDir = os.path.join(storeDir, "_replaced_" + siteName)
+    for leftover in (stagingDir, replacedDir): # From a load that was interrupted
+        if os.path.isdir(leftover):
+            shutil.rmtree(leftover)
+
+    table = to_store_table(df)
+    ds.write_dataset(table, stagingDir, format = "parquet", partitioning = partitioning, existing_data_behavior = "overwrite_or_ignore",
+        basename_template = "part-{i}.parquet", min_rows_per_group = min(rowGroupRows, max(len(df), 1)), max_rows_per_group = rowGroupRows)
+    stagedSiteDir = os.path.join(stagingDir, "Site=" + siteName)
+
+    if os.path.isdir(siteDir):
+        os.replace(siteDir, replacedDir)
+    try:
+        if os.path.isdir(stagedSiteDir):
+            os.replace(stagedSiteDir, siteDir)
+    except OSError:
+        if os.path.isdir(replacedDir):
+            os.replace(replacedDir, siteDir) # Put the old results back
+        raise
+    shutil.rmtree(replacedDir, ignore_errors = True)
+    shutil.rmtree(stagingDir, ignore_errors = True)
+    return table.num_rows
+
+
+def open_store(storeDir):
+    return ds.dataset(storeDir, schema = storeSchema, format = "parquet", partitioning = partitioning)
+
+
+def query(storeDir, columns = None, filter = None):
+    # Read just the columns and rows asked for, e.g.
+    # query(storeDir, ["Site", "AddressID", "Result_Num"], (ds.field("Analyte_Abbrev") == "PFOS") & (ds.field("Year") == 2022))
+    # Filters on Site and Year skip whole partitions; other filters use the Parquet row group statistics where they can.
+    return open_store(storeDir).to_table(columns = columns, filter = filter).to_pandas()
+
+
+def exceedances(storeDir, analyte, limit, year = None, columns = None):
+    # All results for an analyte over its limit (e.g. MCL), statewide, optionally for one year
+    filter = (ds.field("Analyte_Abbrev") == analyte) & (ds.field("Result_Num") > limit)
+    if year is not None:
+        filter &= ds.field("Year") == year
+    columns = columns or ["Site", "Year", "AddressID", "Sampled_Address_Clean", "Sampling_Round", "Collect_Date", "Lab_Sample_ID", "Result_Num"]
+    return query(storeDir, columns, filter)
+
+
+def aggregate(storeDir, by, value = "Result_Num", filter = None, batchSize = rowGroupRows):
+    # Count, detections (value > 0), sum, min, max and mean of a value field, grouped by the "by" fields, over the whole store.
+    # Each record batch is summarized and merged into a running total, so only one batch plus the per-group totals are in memory at once.
+    totals = None
+    scanner = open_store(storeDir).scanner(columns = list(by) + [value], filter = filter, batch_size = batchSize)
+
+    for batch in scanner.to_batches():
+        if batch.num_rows == 0:
+            continue
+        table = pa.Table.from_batches([batch])
+        table = table.append_column("detect", pc.cast(pc.greater(table[value], 0), pa.int64()))
+        partial = table.group_by(list(by)).aggregate([(value, "count"), ("detect", "sum"), (value, "sum"), (value, "min"), (value, "max")])
+        partial = partial.to_pandas().set_index(list(by))
+        partial.columns = ["count", "detects", "sum", "min", "max"]
+
+        if totals is None:
+            totals = partial
+        else:
+            combined = pd.concat([totals, partial])
+            totals = combined.groupby(level = list(range(len(by))), dropna = False).agg({"count": "sum", "detects": "sum", "sum": "sum", "min": "min", "max": "max"})
+
+    if totals is None:
+        return pd.DataFrame(columns = list(by) + ["count", "detects", "sum", "min", "max", "mean"])
+
+    totals["mean"] = totals["sum"] / totals["count"]
+    return totals.reset_index()
+
+
+# Load a site's tall feature class into the store (only when this is run as a script, so the functions above can be imported by other scripts)
+
+if __name__ == "__main__":
+    import arcpy # Only available in ArcGIS Pro's Python environment
+
+    fcPath = location + "/" + gdb + "/" + samplesFC
+    fields = [f.name for f in arcpy.ListFields(fcPath) if f.name in tallSchema.names]
+
+    df = pd.DataFrame.from_records(data = arcpy.da.SearchCursor(fcPath, fields), columns = fields)
+    rows = load_site(df, storeDir)
+    print("Loaded", rows, "rows for", df["Site"].iloc[0], "into", storeDir)
+
+    # Example statewide question: all PFOS exceedances across all sites in 2022
+    print(exceedances(storeDir, "PFOS", 8, year = 2022))
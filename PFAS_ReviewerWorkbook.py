@@ -0,0 +1,148 @@
+# This script is used for exporting PFAS sampling results to Excel workbooks that we hand to reviewers.
+# It can export either the "tall" feature class (see "PFAS_ARFF_Tall") or the "wide" pivoted feature class (see "PFAS_ARFF_Wide").
+
+# The workbook is written in openpyxl's write-only (streaming) mode straight from the feature class cursor, so rows are never all held in memory
+# at once and we don't have to do the df.to_excel / load_workbook / save round trip. Memory stays about the same whether the site has 500 rows or 500,000.
+
+# Each value of the "splitBy" field (e.g. Sampling_Round or Analyte_Group) gets its own sheet. Every sheet has a frozen header row, and any NDE
+# field (Analyte_NDE for tall, Sample_NDE and the <analyte>_NDE fields for wide) gets conditional highlighting for "E" (exceedance) values.
+
+# Last updated 10/18/2026
+
+from openpyxl import Workbook # Used for writing the Excel file in write-only mode
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.formatting.rule import CellIsRule
+from openpyxl.styles import Font, PatternFill
+from openpyxl.utils import get_column_letter
+
+# Things to definitely change per site and user
+
+# Where you want to save the reviewer workbook
+location = r"C:\Users\JohnsonN35\Local_Work\PFAS_Script"
+
+# Geodatabase name (this script assumes your gdb is in the same place as where you want to save the workbook)
+gdb = "PFAS.gdb"
+
+# Name of the site (used for files)
+site_ = "Grayling_GAAF"
+
+# Feature class to export; use the tall XY event feature class or the wide "_Pivoted_FC" one
+sourceFC = "Grayling_GAAF_SiteSummary_Copy_AllResultsFlatFile_XYEvent_FC"
+# sourceFC = site_ + "_Pivoted_FC"
+
+# Field used to split the results into sheets (one sheet per value); "Analyte_Group" only exists in the tall feature class
+splitBy = "Sampling_Round"
+# splitBy = "Analyte_Group"
+
+# Excel extension
+ext = ".xlsx"
+
+# Excel only allows 31 characters in a sheet name and doesn't allow some characters
+maxSheetName = 31
+badSheetChars = '[]:*?/\\'
+
+# Last row Excel allows; used so the highlighting covers the whole column no matter how many rows get written
+maxExcelRow = 1048576
+
+headerFont = Font(bold = True)
+exceedFill = PatternFill(start_color = "FFC7CE", end_color = "FFC7CE", fill_type = "solid")
+exceedFont = Font(color = "9C0006")
+
+
+def sheet_title(value, used):
+    # Turn a split value (e.g. "Round 1" or None) into a valid, unique sheet name
+    title = "Blank" if value is None or str(value).strip() == "" else str(value)
+    for char in badSheetChars:
+        title = title.replace(char, "_")
+    title = title[:maxSheetName]
+
+    base = title
+    count = 2
+    while title.lower() in used:
+        suffix = "_" + str(count)
+        title = base[:maxSheetName - len(suffix)] + suffix
+        count += 1
+    used.add(title.lower())
+    return title
+
+
+def clean_value(value):
+    # NaN (from pandas) can't be written to Excel; write an empty cell instead
+    if isinstance(value, float) and value != value:
+        return None
+    return value
+
+
+def write_reviewer_workbook(outpath, fields, rows, splitBy):
+    # Write rows (any iterable of tuples in the same order as fields) to a write-only workbook, one sheet per value of the splitBy field.
+    # Returns a dictionary of sheet name: number of data rows written.
+    splitIndex = fields.index(splitBy)
+    ndeColumns = [index + 1 for index, field in enumerate(fields) if field.endswith("_NDE")]
+
+    wb = Workbook(write_only = True)
+    sheets = {}
+    counts = {}
+    used = set()
+
+    for row in rows:
+        key = row[splitIndex]
+        ws = sheets.get(key)
+
+        if ws is None:
+            title = sheet_title(key, used)
+            ws = wb.create_sheet(title = title)
+
+            # Sheet views and conditional formatting have to be set up before the first row is streamed out
+            ws.freeze_panes = "A2"
+            for column in ndeColumns:
+                letter = get_column_letter(column)
+                ws.conditional_formatting.add(letter + "2:" + letter + str(maxExcelRow),
+                    CellIsRule(operator = "equal", formula = ['"E"'], fill = exceedFill, font = exceedFont))
+
+            header = []
+            for field in fields:
+                cell = WriteOnlyCell(ws, value = field)
+                cell.font = headerFont
+                header.append(cell)
+            ws.append(header)
+
+            sheets[key] = ws
+            counts[title] = 0
+
+        ws.append([clean_value(value) for value in row])
+        counts[ws.title] += 1
+
+    # An empty source still needs at least one sheet for the workbook to be valid
+    if not sheets:
+        ws = wb.create_sheet(title = "No Results")
+        ws.append(list(fields))
+        counts[ws.title] = 0
+
+    wb.save(outpath)
+    return counts
+
+
+def frame_rows(df, chunksize = 50000):
+    # Stream the rows of a dataframe (e.g. df_wide from PFAS_ARFF_Wide) in chunks so only one chunk is converted to tuples at a time
+    for start in range(0, len(df), chunksize):
+        for row in df.iloc[start:start + chunksize].itertuples(index = False, name = None):
+            yield row
+
+
+# Export the feature class (only when this is run as a script, so the functions above can be imported by other scripts)
+
+if __name__ == "__main__":
+    import arcpy # Only available in ArcGIS Pro's Python environment
+
+    # Don't export the geometry/ObjectID fields; reviewers only want the attributes
+    fields = [f.name for f in arcpy.ListFields(location + "/" + gdb + "/" + sourceFC) if f.type not in ("OID", "Geometry")]
+
+    outpath = location + "/" + site_ + "_" + sourceFC.replace(site_ + "_", "") + "_Review" + ext
+
+    # The cursor hands back one row at a time; sorting by collect date keeps each sheet in date order
+    with arcpy.da.SearchCursor(location + "/" + gdb + "/" + sourceFC, fields, sql_clause = (None, "ORDER BY Collect_Date")) as cursor:
+        counts = write_reviewer_workbook(outpath, fields, cursor, splitBy)
+
+    print("Wrote", outpath)
+    for title, count in counts.items():
+        print("  ", title, ":", count, "rows")
@@ -0,0 +1,153 @@
+# This script is used for exporting the core "tall" PFAS columns to a folder of NumPy .npy arrays that any number of processes can share.
+
+# When several processes analyze the same tall data (per-analyte stats, label generation, spatial queries), each one used to unpickle or
+# re-read its own copy. Opening the arrays with open_arrays() memory-maps them (np.load(mmap_mode = "r")), so every process reads the same
+# pages from the operating system's file cache: no copies, and opening takes milliseconds no matter how many rows there are.
+
+# What gets written to the folder:
+#   Result_Num.npy, RDL.npy, LOQ.npy       float64 (NaN where there's no value)
+#   Collect_Date.npy                       int64 nanoseconds since 1970-01-01 (missingDate where there's no date)
+#   AddressID.npy, Analyte_Abbrev.npy,     int32 codes into codes.json (-1 where there's no value)
+#   Site.npy, Matrix_Stdz.npy
+#   codes.json                             {column: [value for code 0, value for code 1, ...]}, plus the row count
+
+# Each export goes into a new version folder inside arrayDir (v<time>), and only when it's complete does the pointer file (current.txt) get
+# switched to it, so processes never see a half-written export and processes that already have arrays open keep reading the version they
+# opened. Old versions are removed after each export where possible; on Windows a version that's still memory-mapped can't be deleted, so it's
+# left for a later export to clean up once its readers have closed.
+
+# Last updated 10/18/2026
+
+import json
+import os
+import shutil
+import time
+
+import numpy as np # Used for the arrays
+import pandas as pd
+
+# Things to definitely change per site and user
+
+# Geodatabase location and name, and the tall feature class to export
+location = r"C:\Users\JohnsonN35\Local_Work\PFAS_Script"
+gdb = "PFAS.gdb"
+samplesFC = "Grayling_GAAF_SiteSummary_Copy_AllResultsFlatFile_XYEvent_FC"
+
+# Name of the site (used for the output folder)
+site_ = "Grayling_GAAF"
+
+# Where the arrays go
+arrayDir = location + "/PFAS_Arrays/" + site_
+
+numericColumns = ["Result_Num", "RDL", "LOQ"]
+codedColumns = ["AddressID", "Analyte_Abbrev", "Site", "Matrix_Stdz"]
+
+# Collect_Date value for samples with no date (same as NaT)
+missingDate = np.iinfo(np.int64).min
+
+# File in arrayDir naming the current version folder
+pointerFile = "current.txt"
+
+
+def export_arrays(df, arrayDir):
+    # Write the core tall columns of df to a new version folder in arrayDir and point current.txt at it once it's complete
+    version = "v" + str(time.time_ns())
+    tmpDir = arrayDir + "/" + version
+    os.makedirs(tmpDir)
+
+    for column in numericColumns:
+        np.save(tmpDir + "/" + column + ".npy", pd.to_numeric(df[column], errors = "coerce").to_numpy(dtype = np.float64, na_value = np.nan))
+
+    dates = pd.to_datetime(df["Collect_Date"]).to_numpy(dtype = "datetime64[ns]")
+    np.save(tmpDir + "/Collect_Date.npy", dates.view(np.int64))
+
+    codes = {"rows": len(df)}
+    for column in codedColumns:
+        values = df[column].astype("string")
+        if column == "AddressID":
+            values = values.str.replace(r"\.0$", "", regex = True)
+        # Sorted codes, so comparing codes gives the same order as comparing the values
+        columnCodes, uniques = pd.factorize(values, sort = True)
+        np.save(tmpDir + "/" + column + ".npy", columnCodes.astype(np.int32))
+        codes[column] = [str(value) for value in uniques]
+
+    with open(tmpDir + "/codes.json", "w") as f:
+        json.dump(codes, f)
+
+    # Switch the pointer in one step (os.replace of a file is atomic, on Windows too)
+    with open(arrayDir + "/" + pointerFile + ".tmp", "w") as f:
+        f.write(version)
+    os.replace(arrayDir + "/" + pointerFile + ".tmp", arrayDir + "/" + pointerFile)
+
+    remove_old_versions(arrayDir, version)
+    return codes["rows"]
+
+
+def remove_old_versions(arrayDir, keep):
+    # Delete every version folder but keep. One that can't be deleted (still memory-mapped by a reader on Windows) is left for next time.
+    for name in os.listdir(arrayDir):
+        path = arrayDir + "/" + name
+        if name != keep and name.startswith("v") and os.path.isdir(path):
+            try:
+                shutil.rmtree(path)
+            except OSError:
+                pass
+
+
+def current_version(arrayDir):
+    # The version folder current.txt points at
+    with open(arrayDir + "/" + pointerFile) as f:
+        return arrayDir + "/" + f.read().strip()
+
+
+def open_arrays(arrayDir):
+    # Memory-map the current version of the exported arrays (read-only) and load the code dictionary. Returns (arrays, codes).
+    # If an export replaces the version between reading the pointer and opening its files, the old version can be gone, so try the new one.
+    for attempt in range(3):
+        versionDir = current_version(arrayDir)
+        try:
+            with open(versionDir + "/codes.json") as f:
+                codes = json.load(f)
+            arrays = {}
+            for column in numericColumns + ["Collect_Date"] + codedColumns:
+                arrays[column] = np.load(versionDir + "/" + column + ".npy", mmap_mode = "r")
+            return arrays, codes
+        except FileNotFoundError:
+            if attempt == 2:
+                raise
+
+
+def code_of(codes, column, value):
+    # Code for a value in a coded column (e.g. code_of(codes, "Analyte_Abbrev", "PFOS")), or -1 if it isn't in the data
+    try:
+        return codes[column].index(value)
+    except ValueError:
+        return -1
+
+
+def decode(codes, column, columnCodes):
+    # Turn an array of codes back into values (None for -1)
+    lookup = np.array(codes[column] + [None], dtype = object)
+    return lookup[np.asarray(columnCodes)] # -1 picks the None on the end
+
+
+def collect_dates(arrays):
+    # Collect_Date as datetime64 (NaT where there's no date); still a view of the memory-mapped file
+    return arrays["Collect_Date"].view("datetime64[ns]")
+
+
+# Export the tall feature class (only when this is run as a script, so the functions above can be imported by other scripts)
+
+if __name__ == "__main__":
+    import arcpy # Only available in ArcGIS Pro's Python environment
+
+    fields = numericColumns + ["Collect_Date"] + codedColumns
+    df = pd.DataFrame.from_records(data = arcpy.da.SearchCursor(location + "/" + gdb + "/" + samplesFC, fields), columns = fields)
+
+    rows = export_arrays(df, arrayDir)
+    print("Exported", rows, "rows to", arrayDir)
+
+    # Example of reading them back (this is all another process needs to do)
+    arrays, codes = open_arrays(arrayDir)
+    pfos = arrays["Analyte_Abbrev"] == code_of(codes, "Analyte_Abbrev", "PFOS")
+    print("PFOS results:", int(pfos.sum()), " max:", np.nanmax(arrays["Result_Num"][pfos]) if pfos.any() else None)
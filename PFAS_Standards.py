@@ -0,0 +1,117 @@
+# This script is used for working out NDE status (ND / D / E) against the standard (e.g. MCL) that was in force on each sample's collect date.
+
+# The NDE limits used to be hard-coded "as of October 2023", so whenever a standard changed, older samples were re-classified against today's
+# limits. The limits now live in PFAS_Standards.csv, one row per analyte per revision:
+#   Analyte_Abbrev, Limit (ng/l), Unit, Effective_From, Effective_To (blank = still in force), Source
+# When a standard changes, put an Effective_To date on the old row and add a new row starting that day; don't edit the old limit.
+# A sample collected before an analyte's first revision (or of an analyte with no standard at all) has no limit. Its detections are NS
+# ("detected, no standard in force"), not D, since D means "up to the limit" and there wasn't one. If an earlier criterion applied, enter it as
+# its own revision instead.
+
+# Finding the limit for every sample is one vectorized binary search (np.searchsorted) over all the revisions at once, so classifying
+# millions of rows across many revisions is a single pass.
+
+# Last updated 10/18/2026
+
+import os
+import re
+
+import numpy as np
+import pandas as pd
+
+# The standards table that ships with the scripts
+standardsPath = os.path.join(os.path.dirname(os.path.abspath(__file__)), "PFAS_Standards.csv")
+
+# Status of a detection with no limit in force
+noStandard = "NS"
+
+# Spacing between analytes in the combined search key; larger than any number of days we'll see (about 2,700 years)
+analyteStride = 1000000
+
+
+def load_standards(path = standardsPath):
+    # Read and check the standards table. Raises ValueError if an analyte has overlapping revisions or a revision that ends before it starts.
+    standards = pd.read_csv(path, dtype = {"Analyte_Abbrev": str, "Unit": str, "Source": str})
+    standards["Effective_From"] = pd.to_datetime(standards["Effective_From"])
+    standards["Effective_To"] = pd.to_datetime(standards["Effective_To"])
+    standards = standards.sort_values(["Analyte_Abbrev", "Effective_From"]).reset_index(drop = True)
+
+    backwards = standards["Effective_To"].notna() & (standards["Effective_To"] <= standards["Effective_From"])
+    nextFrom = standards.groupby("Analyte_Abbrev")["Effective_From"].shift(-1)
+    overlaps = nextFrom.notna() & (standards["Effective_To"].isna() | (standards["Effective_To"] > nextFrom))
+    problems = standards[backwards | overlaps]
+    if len(problems):
+        raise ValueError("Standards revisions overlap or end before they start:\n" + problems.to_string())
+    return standards
+
+
+def date_days(dates):
+    # Whole days since 1970-01-01 as int64, and a mask of the missing dates (which come back as day 0)
+    dates = pd.to_datetime(pd.Series(dates)).to_numpy(dtype = "datetime64[D]")
+    missing = np.isnat(dates)
+    return np.where(missing, 0, dates.astype(np.int64)), missing
+
+
+def limits_on(analytes, dates, standards):
+    # The limit in force for each (analyte, date) pair; NaN where the analyte has no standard or none was in force on that date
+    analyteCodes = {analyte: code for code, analyte in enumerate(standards["Analyte_Abbrev"].unique())}
+
+    # One sorted key for every revision: analyte code, then start date
+    fromDays, _ = date_days(standards["Effective_From"])
+    toDays, openEnded = date_days(standards["Effective_To"])
+    toDays = np.where(openEnded, np.iinfo(np.int64).max, toDays)
+    stdCodes = standards["Analyte_Abbrev"].map(analyteCodes).to_numpy(dtype = np.int64)
+    stdKeys = stdCodes * analyteStride + fromDays
+    order = np.argsort(stdKeys, kind = "mergesort")
+    stdKeys, stdCodes, toDays = stdKeys[order], stdCodes[order], toDays[order]
+    limits = standards["Limit"].to_numpy(dtype = float)[order]
+
+    sampleCodes = pd.Series(analytes).map(analyteCodes).to_numpy(dtype = float)
+    sampleDays, noDate = date_days(dates)
+    known = ~np.isnan(sampleCodes) & ~noDate
+    sampleKeys = np.where(known, np.nan_to_num(sampleCodes, nan = 0).astype(np.int64) * analyteStride + sampleDays, 0)
+
+    # The revision for a sample is the last one for its analyte that started on or before its date, as long as it hadn't ended yet
+    index = np.searchsorted(stdKeys, sampleKeys, side = "right") - 1
+    safe = np.clip(index, 0, len(stdKeys) - 1)
+    found = known & (index >= 0) & (stdCodes[safe] == sampleCodes) & (sampleDays < toDays[safe])
+    return np.where(found, limits[safe], np.nan)
+
+
+def classify(results, limits):
+    # ND (0), D (above 0, up to the limit), E (over the limit) or NS (above 0 with no limit in force); None where there's no result
+    results = np.asarray(results, dtype = float)
+    limits = np.asarray(limits, dtype = float)
+    status = np.full(len(results), None, dtype = object)
+    status[results == 0] = "ND"
+    status[(results > 0) & np.isnan(limits)] = noStandard
+    status[(results > 0) & (results <= limits)] = "D"
+    status[results > limits] = "E"
+    return status
+
+
+def tall_nde(df, standards):
+    # NDE status of every row of a tall frame (Analyte_Abbrev, Collect_Date, Result_Num)
+    return classify(df["Result_Num"], limits_on(df["Analyte_Abbrev"], df["Collect_Date"], standards))
+
+
+def analyte_field_name(analyte):
+    # Turn an analyte abbreviation into the field name prefix used in the Pivoted table, e.g. "HFPO-DA (GenX)" -> "HFPO_DA_GenX", "6:2 FTS" -> "F_6_2FTS",
+    # "PFOA+PFOS" -> "PFOA_PFOS". Anything else a geodatabase field name can't have becomes "_", and a leading digit gets "F_".
+    field = analyte.replace(" (", "_").replace(")", "").replace(" ", "")
+    field = re.sub(r"[^A-Za-z0-9_]", "_", field)
+    if field[:1].isdigit():
+        field = "F_" + field
+    return field
+
+
+def wide_nde(wide, standards):
+    # <analyte>_NDE for every analyte in the standards table that has a <analyte>_Result_Num field in a wide frame. Returns a dataframe of them.
+    out = pd.DataFrame(index = wide.index)
+    for analyte in standards["Analyte_Abbrev"].unique():
+        field = analyte_field_name(analyte)
+        if field + "_Result_Num" not in wide.columns:
+            continue
+        limits = limits_on(np.full(len(wide), analyte, dtype = object), wide["Collect_Date"], standards)
+        out[field + "_NDE"] = classify(wide[field + "_Result_Num"], limits)
+    return out
@@ -0,0 +1,159 @@
+# This script is used for per-site, per-analyte, per-year statistics of Result_Num: number of results, detection frequency, max, mean,
+# and the 50th, 90th and 95th percentiles. These used to be worked out by exporting spreadsheets.
+
+# Non-detects (Result_Num = 0) are substituted before the mean and percentiles are worked out; set ndSubstitution to one of:
+#   "zero"      0
+#   "half_rdl"  RDL / 2
+#   "rdl"       RDL
+# (a non-detect without an RDL counts as 0). Detection frequency and max always use the reported results.
+
+# Percentiles come from a mergeable quantile sketch: results are counted in logarithmic buckets, each one relativeAccuracy wide (1% by default),
+# so any percentile is within 1% of the exact value. Two sketches are merged by adding their bucket counts, which means statewide or
+# multi-year statistics can be put together from per-site/per-year summaries (e.g. saved with save_summary(), or made one record batch at a time
+# from the statewide store in PFAS_ResultsStore) without going back to the raw rows.
+
+# A summary is two dataframes:
+#   totals   one row per group: Count, Detects, Zeros (results that are 0 after substitution), Sum, Max
+#   bins     one row per group and bucket: Bin, Bin_Count
+
+# Last updated 10/18/2026
+
+import numpy as np
+import pandas as pd # Used for the statistics
+
+# Things to definitely change per user
+
+# Geodatabase location and name, and the tall feature class to summarize
+location = r"C:\Users\JohnsonN35\Local_Work\PFAS_Script"
+gdb = "PFAS.gdb"
+samplesFC = "Grayling_GAAF_SiteSummary_Copy_AllResultsFlatFile_XYEvent_FC"
+
+# Name of the site (used for files)
+site_ = "Grayling_GAAF"
+
+# How non-detects are substituted: "zero", "half_rdl" or "rdl"
+ndSubstitution = "half_rdl"
+
+# Percentiles are accurate to within this fraction of the true value
+relativeAccuracy = 0.01
+
+quantiles = [0.5, 0.9, 0.95]
+
+# Groups to report on
+groupBy = ["Site", "Analyte_Abbrev", "Year"]
+
+ext = ".xlsx"
+
+gamma = (1 + relativeAccuracy) / (1 - relativeAccuracy)
+logGamma = np.log(gamma)
+
+
+def substituted_values(df, ndSubstitution = ndSubstitution):
+    # Result_Num with non-detects replaced per ndSubstitution
+    result = df["Result_Num"].astype(float)
+    nd = result == 0
+    rdl = df["RDL"].astype(float).fillna(0) if "RDL" in df.columns else pd.Series(0.0, index = df.index)
+    if ndSubstitution == "zero":
+        return result
+    if ndSubstitution == "half_rdl":
+        return result.where(~nd, rdl / 2)
+    if ndSubstitution == "rdl":
+        return result.where(~nd, rdl)
+    raise ValueError("ndSubstitution must be 'zero', 'half_rdl' or 'rdl', not " + repr(ndSubstitution))
+
+
+def summarize(df, by = groupBy, ndSubstitution = ndSubstitution):
+    # Build the (totals, bins) summary of a tall frame. Adds Year from Collect_Date if it's asked for and not there.
+    df = df[df["Result_Num"].notna()]
+    if "Year" in by and "Year" not in df.columns:
+        df = df.assign(Year = pd.to_datetime(df["Collect_Date"]).dt.year)
+
+    values = substituted_values(df, ndSubstitution)
+    keys = df[list(by)]
+    positive = values > 0
+
+    work = keys.assign(Count = 1, Detects = (df["Result_Num"] > 0).astype(int), Zeros = (~positive).astype(int), Sum = values,
+        Max = df["Result_Num"].astype(float))
+    totals = work.groupby(list(by), dropna = False).agg({"Count": "sum", "Detects": "sum", "Zeros": "sum", "Sum": "sum", "Max": "max"})
+
+    # Bucket i holds values in (gamma^(i-1), gamma^i]
+    binned = keys[positive].assign(Bin = np.ceil(np.log(values[positive]) / logGamma).astype(np.int32))
+    bins = binned.groupby(list(by) + ["Bin"], dropna = False).size().rename("Bin_Count")
+    return totals.reset_index(), bins.reset_index()
+
+
+def merge_summaries(summaries, by):
+    # Merge several (totals, bins) summaries, grouping by "by"; leave a field out of "by" to combine across it
+    # (e.g. by = ["Analyte_Abbrev", "Year"] gives statewide statistics from per-site summaries)
+    totals = pd.concat([s[0] for s in summaries], ignore_index = True)
+    bins = pd.concat([s[1] for s in summaries], ignore_index = True)
+    totals = totals.groupby(list(by), dropna = False).agg({"Count": "sum", "Detects": "sum", "Zeros": "sum", "Sum": "sum", "Max": "max"})
+    bins = bins.groupby(list(by) + ["Bin"], dropna = False)["Bin_Count"].sum()
+    return totals.reset_index(), bins.reset_index()
+
+
+def statistics(summary, by, quantiles = quantiles):
+    # Turn a summary into a statistics table: Count, Detects, Detection_Freq, Max, Mean and a P<nn> column per quantile
+    totals, bins = summary
+    stats = totals.set_index(list(by))
+    stats["Detection_Freq"] = stats["Detects"] / stats["Count"]
+    stats["Mean"] = stats["Sum"] / stats["Count"]
+
+    bins = bins.sort_values(list(by) + ["Bin"]).set_index(list(by))
+    bins["Cumulative"] = bins.groupby(level = list(range(len(by))), dropna = False)["Bin_Count"].cumsum()
+    bins = bins.join(stats[["Count", "Zeros"]])
+
+    for q in quantiles:
+        column = "P" + str(int(round(q * 100)))
+        rank = q * (bins["Count"] - 1) # 0-based rank of the quantile among the group's values
+        reached = bins[bins["Cumulative"] > rank - bins["Zeros"]]
+        first = reached.groupby(level = list(range(len(by))), dropna = False)["Bin"].first()
+        # A bucket's value is the middle of the bucket, which is within relativeAccuracy of everything in it
+        stats[column] = 2 * np.power(gamma, first.astype(float)) / (gamma + 1)
+        # Quantiles that fall among the zeros are 0
+        stats.loc[q * (stats["Count"] - 1) < stats["Zeros"], column] = 0.0
+
+    return stats.drop(columns = ["Sum", "Zeros"]).reset_index()
+
+
+def summarize_store(storeDir, by = groupBy, filter = None, ndSubstitution = ndSubstitution):
+    # Summarize the statewide store (see PFAS_ResultsStore) one record batch at a time, merging as it goes so memory stays bounded
+    import PFAS_ResultsStore as store
+
+    columns = sorted(set(list(by) + ["Result_Num", "RDL"]))
+    summary = None
+    for batch in store.open_store(storeDir).to_batches(columns = columns, filter = filter):
+        if batch.num_rows == 0:
+            continue
+        part = summarize(batch.to_pandas(), by, ndSubstitution)
+        summary = part if summary is None else merge_summaries([summary, part], by)
+    return summary
+
+
+def save_summary(path, summary):
+    # Save a summary so it can be merged later without the raw rows
+    summary[0].to_parquet(path + "_totals.parquet", index = False)
+    summary[1].to_parquet(path + "_bins.parquet", index = False)
+
+
+def load_summary(path):
+    return pd.read_parquet(path + "_totals.parquet"), pd.read_parquet(path + "_bins.parquet")
+
+
+# Summarize the site (only when this is run as a script, so the functions above can be imported by other scripts)
+
+if __name__ == "__main__":
+    import arcpy # Only available in ArcGIS Pro's Python environment
+
+    fields = ["Site", "Analyte_Abbrev", "Collect_Date", "Result_Num", "RDL"]
+    df = pd.DataFrame.from_records(data = arcpy.da.SearchCursor(location + "/" + gdb + "/" + samplesFC, fields), columns = fields)
+
+    summary = summarize(df)
+    save_summary(location + "/" + site_ + "_Statistics", summary)
+
+    stats = statistics(summary, groupBy)
+    print(stats)
+
+    outpath = location + "/" + site_ + "_Statistics" + ext
+    stats.to_excel(outpath, sheet_name = "Statistics", index = False)
+    print("Wrote", outpath)
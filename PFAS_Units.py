@@ -0,0 +1,87 @@
+# This script is used for standardizing result units. Result_Num, RDL and LOQ are converted to the standard unit for their kind of sample
+# (ng/l for water, ng/g for solids), so the NDE limits, which are in ng/l, compare like with like.
+
+# Labs report the same thing many ways ("ng/L", "ng/l", "ppt", "ug/L", "µg/L", "ppb"...). Unit strings are normalized first (trimmed, lower case,
+# "µ" -> "u", no spaces), then looked up in unitRegistry below. Each row's scale factor is picked out in one vectorized step and Result_Num,
+# RDL and LOQ are each multiplied once, so this runs at millions of rows per second.
+
+# Units that aren't in the registry are rejected: convert_units() raises an error listing each unknown unit, how many rows have it and a
+# few example Lab_Sample_IDs, rather than letting unconverted results through to be compared with ng/l limits.
+# If a lab sends a unit that's legitimately missing, add it to the registry.
+
+# ppt and ppb are treated as water units (1 ppt = 1 ng/l, 1 ppb = 1 ug/l).
+
+# Last updated 10/18/2026
+
+import numpy as np
+import pandas as pd
+
+# Normalized unit: (standard unit, factor to multiply by to get the standard unit)
+unitRegistry = {
+    # Water
+    "pg/l": ("ng/l", 0.001),
+    "ng/l": ("ng/l", 1.0),
+    "ppt": ("ng/l", 1.0),
+    "ug/l": ("ng/l", 1000.0),
+    "ppb": ("ng/l", 1000.0),
+    "ng/ml": ("ng/l", 1000.0),
+    "mg/l": ("ng/l", 1000000.0),
+    "ppm": ("ng/l", 1000000.0),
+    # Solids
+    "ng/g": ("ng/g", 1.0),
+    "ug/kg": ("ng/g", 1.0),
+    "ng/kg": ("ng/g", 0.001),
+    "mg/kg": ("ng/g", 1000.0),
+}
+
+# Fields that are in the result's units and get converted
+valueFields = ["Result_Num", "RDL", "LOQ"]
+
+# How many example Lab_Sample_IDs to list per unknown unit
+reportExamples = 5
+
+
+def normalize_units(units):
+    # "  µg/L " -> "ug/l"
+    return (units.astype("string").str.strip().str.lower()
+        .str.replace("µ", "u", regex = False).str.replace("μ", "u", regex = False).str.replace(" ", "", regex = False))
+
+
+def unit_report(df, registry = unitRegistry, unitField = "Result_Unit"):
+    # One row per distinct unit: the raw unit, its normalized form, standard unit and factor (blank if unknown), and row count
+    report = pd.DataFrame({"unit": df[unitField].astype("string"), "normalized": normalize_units(df[unitField])})
+    report = report.value_counts(dropna = False).rename("rows").reset_index()
+    report["standard"] = report["normalized"].map(lambda u: registry[u][0] if u in registry else None)
+    report["factor"] = report["normalized"].map(lambda u: registry[u][1] if u in registry else None)
+    return report
+
+
+def convert_units(df, registry = unitRegistry, unitField = "Result_Unit", fields = valueFields):
+    # Return a copy of df with the value fields converted to standard units and the standard unit in Result_Unit_Stdz.
+    # Raises ValueError (with a report) if any row with a result has a unit that isn't in the registry.
+    df = df.copy()
+
+    # Factorize once so the registry lookup happens per distinct unit, not per row
+    codes, uniques = pd.factorize(normalize_units(df[unitField]))
+    known = np.array([u in registry for u in uniques] + [False]) # The extra False is for code -1 (blank unit)
+    factors = np.array([registry[u][1] if u in registry else np.nan for u in uniques] + [np.nan])
+    standards = np.array([registry[u][0] if u in registry else None for u in uniques] + [None], dtype = object)
+
+    rowKnown = known[codes]
+    hasValue = df[[f for f in fields if f in df.columns]].notna().any(axis = 1).to_numpy()
+    bad = hasValue & ~rowKnown
+    if bad.any():
+        badRows = df.loc[bad]
+        lines = []
+        for unit, rows in badRows.groupby(badRows[unitField].astype("string").fillna("(blank)"), dropna = False):
+            examples = ", ".join(map(str, rows["Lab_Sample_ID"].drop_duplicates().head(reportExamples))) if "Lab_Sample_ID" in rows.columns else ""
+            lines.append("  " + str(unit) + ": " + str(len(rows)) + " rows" + (" (e.g. " + examples + ")" if examples else ""))
+        raise ValueError("Unknown result units; add them to unitRegistry in PFAS_Units if they're legitimate:\n" + "\n".join(lines))
+
+    factor = factors[codes]
+    for field in fields:
+        if field in df.columns:
+            df[field] = pd.to_numeric(df[field], errors = "coerce").to_numpy(dtype = np.float64, na_value = np.nan) * factor
+
+    df["Result_Unit_Stdz"] = standards[codes]
+    return df
@@ -0,0 +1,169 @@
+# This script is used for exporting the pivoted ("wide") or "tall" PFAS results to flat files for web maps and partners: a GeoJSON
+# FeatureCollection and/or a CSV with coordinates.
+
+# Pro's export tools are slow and memory-hungry on the ~170-field wide table. This script streams the feature class through a cursor in chunks
+# of chunkRows rows, formats each chunk, writes it out and moves on, so memory stays flat however many rows there are.
+#   - exportFields picks which fields go out (None = all of them); the coordinates always go out
+#   - coordinates are rounded to coordPrecision decimal places (6 places is about 10 cm, plenty for address points and much smaller files)
+#   - compress = True writes .geojson.gz / .csv.gz
+# Each export prints its rows, size and throughput (MB/s of uncompressed output).
+
+# Last updated 10/18/2026
+
+import gzip
+import json
+import time
+
+import numpy as np
+import pandas as pd # Used for formatting each chunk
+
+# Things to definitely change per site and user
+
+# Geodatabase location and name, and the feature class to export
+location = r"C:\Users\JohnsonN35\Local_Work\PFAS_Script"
+gdb = "PFAS.gdb"
+
+# Name of the site (used for files)
+site_ = "Grayling_GAAF"
+
+sourceFC = site_ + "_Pivoted_FC"
+
+# Fields to export; None exports every field
+exportFields = None
+# exportFields = ['AddressID','Sampled_Address_Clean','Sampling_Round','Collect_Date','Sample_NDE','PFOA_Result_Num','PFOA_NDE','PFOS_Result_Num','PFOS_NDE']
+
+# Decimal places kept on the coordinates
+coordPrecision = 6
+
+# Rows formatted and written at a time
+chunkRows = 20000
+
+# gzip the output files
+compress = False
+
+# Coordinate field names in the output
+xField = "displayx"
+yField = "displayy"
+
+
+def open_output(path, compress):
+    if compress:
+        return gzip.open(path + ".gz", "wt", encoding = "utf-8", newline = "")
+    return open(path, "w", encoding = "utf-8", newline = "")
+
+
+def frame_chunks(df, chunkRows = chunkRows):
+    # Chunks of an in-memory dataframe, e.g. df_wide from PFAS_ARFF_Wide or the nde stage output of PFAS_Pipeline
+    for start in range(0, len(df), chunkRows):
+        yield df.iloc[start:start + chunkRows]
+
+
+def cursor_chunks(cursor, columns, chunkRows = chunkRows):
+    # Chunks of rows from an arcpy cursor (or any iterator of tuples) as dataframes
+    rows = []
+    for row in cursor:
+        rows.append(row)
+        if len(rows) == chunkRows:
+            yield pd.DataFrame.from_records(rows, columns = columns)
+            rows = []
+    if rows:
+        yield pd.DataFrame.from_records(rows, columns = columns)
+
+
+def json_ready(chunk):
+    # Dates as ISO text and nulls/NaN as None, so every value can go straight into json.dumps
+    chunk = chunk.copy()
+    for field in chunk.columns:
+        if pd.api.types.is_datetime64_any_dtype(chunk[field]):
+            chunk[field] = chunk[field].dt.strftime("%Y-%m-%dT%H:%M:%S")
+    return chunk.astype(object).where(chunk.notna(), None)
+
+
+def write_geojson(path, chunks, fields = None, precision = coordPrecision, compress = compress):
+    # Stream chunks (dataframes with xField/yField) out as one GeoJSON FeatureCollection. Rows without coordinates get a null geometry.
+    # Returns rows, bytes (uncompressed), seconds and MB/s.
+    start = time.perf_counter()
+    rows = 0
+    written = 0
+
+    with open_output(path, compress) as f:
+        head = '{"type":"FeatureCollection","features":[\n'
+        f.write(head)
+        written += len(head)
+        first = True
+
+        for chunk in chunks:
+            properties = fields or [c for c in chunk.columns if c not in (xField, yField)]
+            xs = np.round(chunk[xField].to_numpy(dtype = float), precision)
+            ys = np.round(chunk[yField].to_numpy(dtype = float), precision)
+            values = json_ready(chunk[properties])
+
+            lines = []
+            for x, y, row in zip(xs.tolist(), ys.tolist(), values.itertuples(index = False, name = None)):
+                geometry = None if x != x or y != y else {"type": "Point", "coordinates": [x, y]}
+                feature = {"type": "Feature", "geometry": geometry, "properties": dict(zip(properties, row))}
+                lines.append(json.dumps(feature, separators = (",", ":"), default = str))
+
+            if not lines:
+                continue
+            text = ("" if first else ",\n") + ",\n".join(lines)
+            first = False
+            f.write(text)
+            written += len(text)
+            rows += len(lines)
+
+        tail = "\n]}\n"
+        f.write(tail)
+        written += len(tail)
+
+    return export_stats(rows, written, start)
+
+
+def write_csv(path, chunks, fields = None, precision = coordPrecision, compress = compress):
+    # Stream chunks out as a CSV with the coordinates as the last two columns. Returns rows, bytes (uncompressed), seconds and MB/s.
+    start = time.perf_counter()
+    rows = 0
+    written = 0
+
+    with open_output(path, compress) as f:
+        header = True
+        for chunk in chunks:
+            columns = (fields or [c for c in chunk.columns if c not in (xField, yField)]) + [xField, yField]
+            out = chunk[columns].copy()
+            out[xField] = np.round(out[xField].astype(float), precision)
+            out[yField] = np.round(out[yField].astype(float), precision)
+
+            text = out.to_csv(index = False, header = header, date_format = "%Y-%m-%d %H:%M:%S")
+            f.write(text)
+            written += len(text)
+            rows += len(out)
+            header = False
+
+    return export_stats(rows, written, start)
+
+
+def export_stats(rows, written, start):
+    seconds = time.perf_counter() - start
+    megabytes = written / 1024 ** 2
+    return {"rows": rows, "bytes": written, "seconds": seconds, "mbPerSecond": megabytes / seconds if seconds else float("inf")}
+
+
+def print_stats(path, stats):
+    print("{}: {:,} rows, {:.1f} MB in {:.2f} s ({:.1f} MB/s)".format(path, stats["rows"], stats["bytes"] / 1024 ** 2, stats["seconds"], stats["mbPerSecond"]))
+
+
+# Export the feature class (only when this is run as a script, so the functions above can be imported by other scripts)
+
+if __name__ == "__main__":
+    import arcpy # Only available in ArcGIS Pro's Python environment
+
+    fcPath = location + "/" + gdb + "/" + sourceFC
+    fields = exportFields or [f.name for f in arcpy.ListFields(fcPath) if f.type not in ("OID", "Geometry") and f.name not in (xField, yField)]
+    columns = fields + [xField, yField]
+
+    # The point geometry is in WGS 1984, so SHAPE@X / SHAPE@Y are longitude / latitude
+    for ext, writer in ((".geojson", write_geojson), (".csv", write_csv)):
+        outpath = location + "/" + sourceFC + ext
+        with arcpy.da.SearchCursor(fcPath, fields + ["SHAPE@X", "SHAPE@Y"]) as cursor:
+            stats = writer(outpath, cursor_chunks(cursor, columns), fields)
+        print_stats(outpath + (".gz" if compress else ""), stats)
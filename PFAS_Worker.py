@@ -0,0 +1,261 @@
+# This script is used for keeping a warm PFAS worker process running in the background so repeat pipeline runs (see "PFAS_Pipeline") don't start cold.
+
+# Every normal run imports pandas/openpyxl, re-reads the site summary workbook and reloads the master PFAS_Addresses layer. The worker does those
+# things once and keeps the results in memory:
+#   - the address index for each site (the site's rows of PFAS_Addresses), refreshed after addressMaxAge seconds or when a job asks for it
+#   - recently used stage outputs (parsed workbooks, joined tall frames, wide frames), evicted least-recently-used once maxCacheBytes is reached
+# A repeat run of a site with nothing changed is answered from memory in well under a second.
+# PFAS_Standards.csv is small, so it's read fresh for every job (see site_stage_config); edits to it apply to the next job.
+
+# Start the worker:           python PFAS_Worker.py --serve
+# Run a site through it:      python PFAS_Worker.py --site "Grayling GAAF" --name Grayling-GAAF_SiteSummary_Copy [--dry-run] [--refresh]
+# Check what it's holding:    python PFAS_Worker.py --status
+# Stop it:                    python PFAS_Worker.py --shutdown
+
+# The client side only uses the standard library, so it starts instantly; pandas and arcpy are only imported by the worker.
+# Jobs come in over a local Unix socket (a named pipe on Windows, where ArcGIS Pro runs, since Windows Python doesn't support Unix sockets).
+# Clients have to know the worker's key (PFAS_WORKER_KEY, or the key file the first --serve makes), so other users on the machine can't send it jobs.
+
+# Last updated 10/18/2026
+
+import argparse
+import importlib
+import os
+import secrets
+import sys
+import time
+from collections import OrderedDict
+from multiprocessing.connection import Client, Listener # Used for the local socket between the client and the worker
+
+# Things to definitely change per user
+
+# Geodatabase and site summary workbook location
+location = r"C:\Users\JohnsonN35\Local_Work\PFAS_Script"
+
+# Geodatabase name
+gdb = "PFAS.gdb"
+
+# Where the worker listens; only processes on this machine can connect
+if sys.platform == "win32":
+    address = r"\\.\pipe\PFAS_Worker"
+    family = "AF_PIPE"
+else:
+    address = os.path.join(os.path.expanduser("~"), ".pfas_worker.sock")
+    family = "AF_UNIX"
+
+# Shared secret between the client and the worker (checked with an HMAC handshake on connect, and needed since the worker unpickles what clients
+# send): PFAS_WORKER_KEY if it's set, otherwise a random key in keyFile, made readable only by you the first time the worker is started
+keyFile = os.path.join(os.path.expanduser("~"), ".pfas_worker.key")
+
+# How much memory the stage output cache can use before it starts evicting (bytes)
+maxCacheBytes = 4 * 1024 ** 3
+
+# How long (seconds) a site's address index is trusted before it's re-read from PFAS_Addresses
+addressMaxAge = 15 * 60
+
+
+class FrameCache:
+    # Least-recently-used cache of stage key: output, limited by the approximate memory used by the outputs.
+    # Works as the "memory" argument of PFAS_Pipeline.run_pipeline.
+
+    def __init__(self, maxBytes):
+        self.maxBytes = maxBytes
+        self.items = OrderedDict()
+        self.sizes = {}
+        self.totalBytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def __contains__(self, key):
+        found = key in self.items
+        if found:
+            self.hits += 1
+        else:
+            self.misses += 1
+        return found
+
+    def __getitem__(self, key):
+        self.items.move_to_end(key)
+        return self.items[key]
+
+    def __setitem__(self, key, value):
+        if key in self.items:
+            self.totalBytes -= self.sizes.pop(key)
+            del self.items[key]
+        size = object_bytes(value)
+        self.items[key] = value
+        self.sizes[key] = size
+        self.totalBytes += size
+
+        # Evict the least recently used outputs, but always keep the one we just added
+        while self.totalBytes > self.maxBytes and len(self.items) > 1:
+            oldKey, _ = self.items.popitem(last = False)
+            self.totalBytes -= self.sizes.pop(oldKey)
+
+    def clear(self):
+        self.items.clear()
+        self.sizes.clear()
+        self.totalBytes = 0
+
+
+def object_bytes(value):
+    # Approximate memory used by a stage output; dataframes report their own size, everything else is small
+    if hasattr(value, "memory_usage"):
+        return int(value.memory_usage(index = True, deep = True).sum())
+    return sys.getsizeof(value)
+
+
+def auth_key(create = False):
+    # The shared secret; with create, make keyFile if it isn't there yet
+    if os.environ.get("PFAS_WORKER_KEY"):
+        return os.environ["PFAS_WORKER_KEY"].encode("utf-8")
+    if create:
+        try:
+            fd = os.open(keyFile, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        except FileExistsError:
+            pass
+        else:
+            with os.fdopen(fd, "w") as f:
+                f.write(secrets.token_hex(32))
+    if not os.path.exists(keyFile):
+        raise SystemExit("No worker key: set PFAS_WORKER_KEY, or start the worker with --serve to make " + keyFile)
+    with open(keyFile) as f:
+        return f.read().strip().encode("utf-8")
+
+
+# -------------------WORKER-------------------
+
+def serve():
+    # Import the heavy things once, up front; this is the cost the worker is here to pay only once
+    # openpyxl and arcpy are only imported to load them now; pandas and the pipeline stages use them later
+    importlib.import_module("openpyxl") # Used by pandas to read the site summary workbooks
+    import PFAS_Pipeline as pipeline
+    try:
+        importlib.import_module("arcpy") # Only available in ArcGIS Pro's Python environment
+    except ImportError:
+        print("arcpy isn't available here; the addresses and write stages will fail")
+
+    memory = FrameCache(maxCacheBytes)
+    addressIndex = {} # Address layer where clause: (time loaded, dataframe)
+
+    def job_stages(refresh):
+        stages = pipeline.build_stages()
+
+        # Serve the address layer from memory unless it's stale or the job asked for a refresh
+        def addresses_stage(inputs, config):
+            loaded = addressIndex.get(config["where"])
+            if refresh or loaded is None or time.time() - loaded[0] > addressMaxAge:
+                loaded = (time.time(), pipeline.addresses_stage(inputs, config))
+                addressIndex[config["where"]] = loaded
+            return loaded[1]
+
+        stages["addresses"] = dict(stages["addresses"], run = addresses_stage)
+        return stages
+
+    def run_job(job):
+        overrides = job.get("overrides") or {}
+        stageConfig = pipeline.site_stage_config(location, job["name"], gdb, job["site"], job["site_"], overrides)
+        cacheDir = location + "/PFAS_Cache/" + job["site_"]
+
+        start = time.perf_counter()
+        report = pipeline.run_pipeline(job_stages(job.get("refresh", False)), stageConfig, cacheDir,
+            targets = job.get("targets"), dryRun = job.get("dryRun", False), memory = memory)
+        return {"ok": True, "report": report, "seconds": time.perf_counter() - start}
+
+    def status():
+        return {"ok": True, "cachedOutputs": len(memory.items), "cacheBytes": memory.totalBytes, "hits": memory.hits, "misses": memory.misses,
+            "addressIndexes": {where: time.time() - loaded for where, (loaded, df) in addressIndex.items()}}
+
+    if family == "AF_UNIX" and os.path.exists(address):
+        os.remove(address) # Left over from a worker that didn't shut down cleanly
+
+    with Listener(address, family = family, authkey = auth_key(create = True)) as listener:
+        if family == "AF_UNIX":
+            os.chmod(address, 0o600)
+        print("PFAS worker listening on", address)
+
+        # Jobs run one at a time; they share the in-memory cache, and arcpy isn't safe to use from several threads at once
+        while True:
+            try:
+                conn = listener.accept()
+            except Exception as e:
+                print("Rejected connection:", e)
+                continue
+
+            with conn:
+                try:
+                    request = conn.recv()
+                    command = request.get("cmd")
+                    if command == "run":
+                        response = run_job(request)
+                    elif command == "status":
+                        response = status()
+                    elif command == "evict":
+                        memory.clear()
+                        addressIndex.clear()
+                        response = {"ok": True}
+                    elif command == "shutdown":
+                        conn.send({"ok": True})
+                        break
+                    else:
+                        response = {"ok": False, "error": "Unknown command: " + str(command)}
+                except Exception as e:
+                    response = {"ok": False, "error": type(e).__name__ + ": " + str(e)}
+                conn.send(response)
+
+    print("PFAS worker stopped")
+
+
+# -------------------CLIENT-------------------
+
+def send(request):
+    # Send one request to the worker and wait for the response
+    with Client(address, family = family, authkey = auth_key()) as conn:
+        conn.send(request)
+        return conn.recv()
+
+
+def main():
+    parser = argparse.ArgumentParser(description = "Warm PFAS pipeline worker and its client")
+    parser.add_argument("--serve", action = "store_true", help = "start the worker")
+    parser.add_argument("--status", action = "store_true", help = "show what the worker is holding")
+    parser.add_argument("--evict", action = "store_true", help = "drop everything the worker is holding")
+    parser.add_argument("--shutdown", action = "store_true", help = "stop the worker")
+    parser.add_argument("--site", help = "site name as used in the PFAS_Addresses Site field, e.g. \"Grayling GAAF\"")
+    parser.add_argument("--name", help = "site summary workbook file name without the extension")
+    parser.add_argument("--target", action = "append", help = "only run the stages needed for this stage (can be repeated)")
+    parser.add_argument("--dry-run", action = "store_true", help = "show which stages would run")
+    parser.add_argument("--refresh", action = "store_true", help = "re-read the address layer even if the worker has it")
+    args = parser.parse_args()
+
+    if args.serve:
+        serve()
+        return
+
+    start = time.perf_counter()
+    if args.status:
+        response = send({"cmd": "status"})
+    elif args.evict:
+        response = send({"cmd": "evict"})
+    elif args.shutdown:
+        response = send({"cmd": "shutdown"})
+    elif args.site and args.name:
+        response = send({"cmd": "run", "site": args.site, "site_": args.site.replace(" ", "_"), "name": args.name,
+            "targets": args.target, "dryRun": args.dry_run, "refresh": args.refresh})
+    else:
+        parser.error("give --serve, --status, --evict, --shutdown, or --site and --name to run a site")
+
+    if not response.get("ok"):
+        print("Worker error:", response.get("error"))
+        sys.exit(1)
+
+    for stageName, (stageStatus, seconds) in response.get("report", {}).items():
+        print("  {:<20} {:<10} {:.2f} s".format(stageName, stageStatus, seconds))
+    for key, value in response.items():
+        if key not in ("ok", "report"):
+            print(key + ":", value)
+    print("Round trip: {:.3f} s".format(time.perf_counter() - start))
+
+
+if __name__ == "__main__":
+    main()